@@ -1,5 +1,5 @@
 # Services module
 from .analytics_service import AnalyticsService
-from .ml_service import MLService
+from .ml_service import MLService, ModelNotTrainedError
 
-__all__ = ['AnalyticsService', 'MLService']
+__all__ = ['AnalyticsService', 'MLService', 'ModelNotTrainedError']
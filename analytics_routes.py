@@ -2,22 +2,34 @@
 Analytics Routes
 API endpoints for analytics and insights
 """
-from fastapi import APIRouter, HTTPException, Query
-from typing import Optional
-import sys
-from pathlib import Path
-sys.path.insert(0, str(Path(__file__).parent.parent))
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse, ORJSONResponse
+from typing import Optional, Iterable, Iterator
+import orjson
 
-from services import AnalyticsService, MLService
+from services import AnalyticsService
+from models.sql_models import UserRole
+from dependencies import get_analytics_service
 
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
-analytics_service = AnalyticsService()
-ml_service = MLService()
+NDJSON_CHUNK_ROWS = 1000
+
+
+def _ndjson_chunks(records: Iterable[dict]) -> Iterator[bytes]:
+    """Encode records as newline-delimited JSON, NDJSON_CHUNK_ROWS lines per chunk"""
+    lines = []
+    for record in records:
+        lines.append(orjson.dumps(record))
+        if len(lines) == NDJSON_CHUNK_ROWS:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
 
 
 @router.get("/class")
-async def get_class_analytics(department: Optional[str] = Query(None, description="Filter by department")):
+def get_class_analytics(department: Optional[str] = Query(None, description="Filter by department"), analytics_service: AnalyticsService = Depends(get_analytics_service)):
     """Get class-level analytics"""
     try:
         analytics = analytics_service.get_class_analytics(department)
@@ -25,11 +37,11 @@ async def get_class_analytics(department: Optional[str] = Query(None, descriptio
         if not analytics:
             raise HTTPException(status_code=404, detail="No data found")
         
-        return {
+        return ORJSONResponse({
             "success": True,
             "data": analytics,
             "filters": {"department": department}
-        }
+        })
     except HTTPException:
         raise
     except Exception as e:
@@ -37,65 +49,74 @@ async def get_class_analytics(department: Optional[str] = Query(None, descriptio
 
 
 @router.get("/departments")
-async def get_department_analytics():
+def get_department_analytics(analytics_service: AnalyticsService = Depends(get_analytics_service)):
     """Get department-wise analytics"""
     try:
         summary = analytics_service.get_department_summary()
         
-        return {
+        return ORJSONResponse({
             "success": True,
             "data": summary,
             "count": len(summary)
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/subjects")
-async def get_subject_analytics():
+def get_subject_analytics(analytics_service: AnalyticsService = Depends(get_analytics_service)):
     """Get subject-wise analytics"""
     try:
         summary = analytics_service.get_subject_summary()
         
-        return {
+        return ORJSONResponse({
             "success": True,
             "data": summary,
             "count": len(summary)
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/correlation/attendance-marks")
-async def get_attendance_marks_correlation():
+def get_attendance_marks_correlation(analytics_service: AnalyticsService = Depends(get_analytics_service)):
     """Get correlation between attendance and marks"""
     try:
         correlation = analytics_service.get_attendance_marks_correlation()
         
-        return {
+        return ORJSONResponse({
             "success": True,
             "data": correlation
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/correlation/attendance-marks/stream")
+def stream_attendance_marks_points(analytics_service: AnalyticsService = Depends(get_analytics_service)):
+    """Stream every attendance/marks point as NDJSON"""
+    return StreamingResponse(
+        _ndjson_chunks(analytics_service.iter_attendance_marks_points()),
+        media_type="application/x-ndjson"
+    )
+
+
 @router.get("/correlation/stress-marks")
-async def get_stress_marks_correlation():
+def get_stress_marks_correlation(analytics_service: AnalyticsService = Depends(get_analytics_service)):
     """Get correlation between stress indicators and marks"""
     try:
         correlation = analytics_service.get_stress_marks_correlation()
         
-        return {
+        return ORJSONResponse({
             "success": True,
             "data": correlation
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/mental-health")
-async def get_mental_health_trends(department: Optional[str] = Query(None, description="Filter by department")):
+def get_mental_health_trends(department: Optional[str] = Query(None, description="Filter by department"), analytics_service: AnalyticsService = Depends(get_analytics_service)):
     """Get mental health trends"""
     try:
         trends = analytics_service.get_mental_health_trends(department)
@@ -103,11 +124,11 @@ async def get_mental_health_trends(department: Optional[str] = Query(None, descr
         if not trends:
             raise HTTPException(status_code=404, detail="No data found")
         
-        return {
+        return ORJSONResponse({
             "success": True,
             "data": trends,
             "filters": {"department": department}
-        }
+        })
     except HTTPException:
         raise
     except Exception as e:
@@ -115,20 +136,20 @@ async def get_mental_health_trends(department: Optional[str] = Query(None, descr
 
 
 @router.get("/at-risk")
-async def get_at_risk_students(department: Optional[str] = Query(None, description="Filter by department")):
+def get_at_risk_students(department: Optional[str] = Query(None, description="Filter by department"), analytics_service: AnalyticsService = Depends(get_analytics_service)):
     """Get list of at-risk students"""
     try:
-        analytics = analytics_service.get_class_analytics(department)
+        at_risk = analytics_service.get_at_risk_students(department)
         
-        if not analytics:
+        if not at_risk['risk_distribution']:
             raise HTTPException(status_code=404, detail="No data found")
         
-        return {
+        return ORJSONResponse({
             "success": True,
-            "data": analytics['at_risk_students'],
-            "count": len(analytics['at_risk_students']),
-            "risk_distribution": analytics['risk_distribution']
-        }
+            "data": at_risk['students'],
+            "count": len(at_risk['students']),
+            "risk_distribution": at_risk['risk_distribution']
+        })
     except HTTPException:
         raise
     except Exception as e:
@@ -136,42 +157,28 @@ async def get_at_risk_students(department: Optional[str] = Query(None, descripti
 
 
 @router.get("/teacher-dashboard")
-async def get_teacher_dashboard(department: Optional[str] = Query(None, description="Filter by department")):
+def get_teacher_dashboard(department: Optional[str] = Query(None, description="Filter by department"), analytics_service: AnalyticsService = Depends(get_analytics_service)):
     """Get complete teacher dashboard data"""
     try:
-        class_analytics = analytics_service.get_class_analytics(department)
-        subject_analytics = analytics_service.get_subject_summary()
-        attendance_correlation = analytics_service.get_attendance_marks_correlation()
+        dashboard = analytics_service.get_dashboard_bundle(UserRole.TEACHER, department)
         
-        return {
+        return ORJSONResponse({
             "success": True,
-            "data": {
-                "class_analytics": class_analytics,
-                "subject_analytics": subject_analytics,
-                "attendance_correlation": attendance_correlation
-            }
-        }
+            "data": dashboard
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/counselor-dashboard")
-async def get_counselor_dashboard(department: Optional[str] = Query(None, description="Filter by department")):
+def get_counselor_dashboard(department: Optional[str] = Query(None, description="Filter by department"), analytics_service: AnalyticsService = Depends(get_analytics_service)):
     """Get complete counselor/admin dashboard data"""
     try:
-        mental_health = analytics_service.get_mental_health_trends(department)
-        stress_correlation = analytics_service.get_stress_marks_correlation()
-        class_analytics = analytics_service.get_class_analytics(department)
-        department_summary = analytics_service.get_department_summary()
+        dashboard = analytics_service.get_dashboard_bundle(UserRole.COUNSELOR, department)
         
-        return {
+        return ORJSONResponse({
             "success": True,
-            "data": {
-                "mental_health": mental_health,
-                "stress_correlation": stress_correlation,
-                "at_risk_students": class_analytics.get('at_risk_students', []) if class_analytics else [],
-                "department_summary": department_summary
-            }
-        }
+            "data": dashboard
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -2,21 +2,66 @@
 Analytics Service
 Provides comprehensive analytics for dashboards
 """
-import sys
-from pathlib import Path
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
 from preprocessing import (
     load_students, load_academics, load_mental_health,
+    load_academics_by_student, load_mental_health_by_student,
     clean_academic_data, clean_mental_health_data,
-    get_aggregated_student_data, get_department_analytics,
-    get_subject_analytics
+    get_aggregated_student_data, get_aggregated_student_arrays, get_department_analytics,
+    get_at_risk_students, get_subject_analytics, get_data_version, AGGREGATED_NUMERIC_COLUMNS
 )
 from models.sentiment_analyzer import SentimentAnalyzer
-from typing import Dict, Any, List
+from models.sql_models import UserRole
+from cachetools import TTLCache
+from typing import Dict, Any, List, Callable, Hashable, Iterator
+import threading
 import pandas as pd
 import numpy as np
 
+RESULT_CACHE_TTL_SECONDS = 60
+_MISSING = object()
+
+
+# Category labels indexed by the codes _classify_students returns
+PERFORMANCE_LABELS = np.array(['Poor', 'Average', 'Good', 'Excellent'])
+PERFORMANCE_THRESHOLDS = np.array([40, 60, 80])
+RISK_LABELS = np.array(['Low', 'Medium', 'High'])
+
+
+def _classify_students(marks: np.ndarray, mood: np.ndarray):
+    """Performance and risk codes for each student, computed on whole arrays"""
+    perf = np.searchsorted(PERFORMANCE_THRESHOLDS, marks, side='right').astype(np.int8)
+    perf[np.isnan(marks)] = 0
+    risk = np.select(
+        [(marks >= 70) & (mood >= 4), (marks < 50) | (mood <= 2)],
+        [0, 2],
+        default=1
+    ).astype(np.int8)
+    return perf, risk
+
+
+def _label_counts(codes: np.ndarray, labels: np.ndarray) -> Dict[str, int]:
+    """Count occurrences of each category code, keyed by its label"""
+    values, counts = np.unique(codes, return_counts=True)
+    return dict(zip(labels[values].tolist(), counts.tolist()))
+
+
+def _group_means(group_idx: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+    """Mean of values per group index, skipping NaN like pandas does"""
+    valid = ~np.isnan(values)
+    sums = np.bincount(group_idx, weights=np.where(valid, values, 0.0), minlength=n_groups)
+    counts = np.bincount(group_idx, weights=valid.astype(np.float64), minlength=n_groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return sums / counts
+
+
+def _rows_for_student(indexed: pd.DataFrame, student_id) -> pd.DataFrame:
+    """Select one student's rows from a frame indexed by student_id"""
+    try:
+        rows = indexed.loc[[student_id]]
+    except KeyError:
+        rows = indexed.iloc[0:0]
+    return rows.reset_index(drop=True)
+
 
 class AnalyticsService:
     """
@@ -25,13 +70,23 @@ class AnalyticsService:
     
     def __init__(self):
         self.sentiment_analyzer = SentimentAnalyzer()
-        self._cache = {}
+        self._cache = TTLCache(maxsize=64, ttl=RESULT_CACHE_TTL_SECONDS)
+        self._cache_lock = threading.Lock()
+    
+    def _cached(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Return the cached result for key, computing it with fn on a miss.
+        The data version is part of the key so writes invalidate old entries."""
+        key = (key, get_data_version())
+        with self._cache_lock:
+            result = self._cache.get(key, _MISSING)
+        if result is _MISSING:
+            result = fn()
+            with self._cache_lock:
+                self._cache[key] = result
+        return result
     
     def get_student_performance_trends(self, student_id: int) -> Dict[str, Any]:
         """Get performance trends for a specific student"""
-        academics = clean_academic_data(load_academics())
-        mental_health = clean_mental_health_data(load_mental_health())
-        
         # Ensure student_id is int for comparison if needed, or string matching DB
         # Assuming DB returns ints
         try:
@@ -39,8 +94,8 @@ class AnalyticsService:
         except ValueError:
             pass # Keep as string if conversion fails
             
-        student_academics = academics[academics['student_id'] == student_id]
-        student_mental = mental_health[mental_health['student_id'] == student_id]
+        student_academics = _rows_for_student(load_academics_by_student(), student_id)
+        student_mental = _rows_for_student(load_mental_health_by_student(), student_id)
         
         if student_academics.empty and student_mental.empty:
              # Fallback to return empty structure instead of None to prevent frontend crash
@@ -54,13 +109,17 @@ class AnalyticsService:
         # Time-based mental health trends
         mental_trends = []
         if not student_mental.empty:
-            for _, row in student_mental.iterrows():
-                sentiment = self.sentiment_analyzer.analyze(row['text_feedback'])
+            sentiments = self.sentiment_analyzer.analyze_batch(
+                student_mental['text_feedback'].tolist()
+            )['individual_results']
+            dates = student_mental['recorded_date'].dt.strftime('%Y-%m-%d').tolist()
+            rows = student_mental[['mood_score', 'study_hours', 'sleep_hours']].itertuples(index=False)
+            for row, date, sentiment in zip(rows, dates, sentiments):
                 mental_trends.append({
-                    'date': row['recorded_date'].strftime('%Y-%m-%d'),
-                    'mood_score': int(row['mood_score']),
-                    'study_hours': float(row['study_hours']),
-                    'sleep_hours': float(row['sleep_hours']),
+                    'date': date,
+                    'mood_score': int(row.mood_score),
+                    'study_hours': float(row.study_hours),
+                    'sleep_hours': float(row.sleep_hours),
                     'sentiment': sentiment['sentiment'],
                     'polarity': sentiment['polarity']
                 })
@@ -85,43 +144,32 @@ class AnalyticsService:
     
     def get_class_analytics(self, department: str = None) -> Dict[str, Any]:
         """Get class-level analytics, optionally filtered by department"""
-        data = get_aggregated_student_data()
-        
+        return self._cached(
+            ('class_analytics', department),
+            lambda: self._class_analytics(get_aggregated_student_data(), department)
+        )
+    
+    def _class_analytics(self, data: pd.DataFrame, department: str = None) -> Dict[str, Any]:
         if department:
             data = data[data['department'] == department]
         
         if data.empty:
             return None
         
-        # Performance distribution
-        def categorize_performance(marks):
-            if marks >= 80:
-                return 'Excellent'
-            elif marks >= 60:
-                return 'Good'
-            elif marks >= 40:
-                return 'Average'
-            else:
-                return 'Poor'
+        perf_codes, risk_codes = _classify_students(
+            data['avg_marks'].to_numpy(dtype=np.float64),
+            data['avg_mood'].to_numpy(dtype=np.float64)
+        )
         
-        data['performance_category'] = data['avg_marks'].apply(categorize_performance)
-        perf_distribution = data['performance_category'].value_counts().to_dict()
+        # Performance distribution
+        perf_distribution = _label_counts(perf_codes, PERFORMANCE_LABELS)
         
         # Risk distribution (based on preprocessing logic)
-        def calculate_risk(row):
-            if row['avg_marks'] >= 70 and row['avg_mood'] >= 4:
-                return 'Low'
-            elif row['avg_marks'] < 50 or row['avg_mood'] <= 2:
-                return 'High'
-            else:
-                return 'Medium'
-        
-        data['risk_level'] = data.apply(calculate_risk, axis=1)
-        risk_distribution = data['risk_level'].value_counts().to_dict()
+        risk_distribution = _label_counts(risk_codes, RISK_LABELS)
         
         # At-risk students
-        at_risk = data[data['risk_level'] == 'High'][
-            ['student_id', 'name', 'department', 'avg_marks', 'avg_mood']
+        at_risk = data.loc[
+            risk_codes == 2, ['student_id', 'name', 'department', 'avg_marks', 'avg_mood']
         ].to_dict('records')
         
         # Statistics
@@ -142,12 +190,18 @@ class AnalyticsService:
     
     def get_attendance_marks_correlation(self) -> Dict[str, Any]:
         """Analyze correlation between attendance and marks"""
-        academics = clean_academic_data(load_academics())
+        return self._cached(
+            ('attendance_marks_correlation',),
+            lambda: self._attendance_marks_correlation(clean_academic_data(load_academics()))
+        )
+    
+    def _attendance_marks_correlation(self, academics: pd.DataFrame) -> Dict[str, Any]:
+        academics = academics.copy()
         
         correlation = academics['attendance_percentage'].corr(academics['subject_marks'])
         
-        # Create scatter plot data
-        scatter_data = academics[['attendance_percentage', 'subject_marks']].to_dict('records')
+        # Create scatter plot data, limited for the frontend before building the dicts
+        scatter_data = academics[['attendance_percentage', 'subject_marks']].head(100).to_dict('records')
         
         # Group by attendance ranges
         def attendance_range(att):
@@ -164,20 +218,26 @@ class AnalyticsService:
         range_stats = academics.groupby('att_range')['subject_marks'].mean().to_dict()
         
         return {
-            'correlation_coefficient': round(correlation, 3),
+            'correlation_coefficient': round(float(correlation), 3),
             'interpretation': self._interpret_correlation(correlation),
             'range_wise_average': range_stats,
-            'data_points': scatter_data[:100]  # Limit for frontend
+            'data_points': scatter_data
         }
     
+    def iter_attendance_marks_points(self) -> Iterator[Dict[str, float]]:
+        """Yield every attendance/marks point one at a time, for full downloads"""
+        academics = clean_academic_data(load_academics())
+        for attendance, marks in academics[['attendance_percentage', 'subject_marks']].itertuples(index=False):
+            yield {'attendance_percentage': float(attendance), 'subject_marks': float(marks)}
+    
     def get_mental_health_trends(self, department: str = None) -> Dict[str, Any]:
         """Get mental health trends across students"""
-        mental_health = clean_mental_health_data(load_mental_health())
-        students = load_students()
-        
-        # Merge with student info
-        data = mental_health.merge(students[['student_id', 'department']], on='student_id')
-        
+        return self._cached(
+            ('mental_health_trends', department),
+            lambda: self._mental_health_trends(self._load_mental_health_frame(), department)
+        )
+    
+    def _mental_health_trends(self, data: pd.DataFrame, department: str = None) -> Dict[str, Any]:
         if department:
             data = data[data['department'] == department]
         
@@ -189,17 +249,20 @@ class AnalyticsService:
         batch_analysis = self.sentiment_analyzer.analyze_batch(all_feedback)
         
         # Mood distribution
-        mood_dist = data['mood_score'].value_counts().sort_index().to_dict()
+        moods, mood_counts = np.unique(data['mood_score'].dropna().to_numpy(), return_counts=True)
+        mood_dist = dict(zip(moods.tolist(), mood_counts.tolist()))
         
         # Time-based trends (average by date)
-        time_trends = data.groupby('recorded_date').agg({
-            'mood_score': 'mean',
-            'study_hours': 'mean',
-            'sleep_hours': 'mean'
-        }).reset_index()
-        
-        time_trends['recorded_date'] = time_trends['recorded_date'].dt.strftime('%Y-%m-%d')
-        time_trends = time_trends.to_dict('records')
+        dates, date_idx = np.unique(data['recorded_date'].to_numpy(), return_inverse=True)
+        trend_columns = ['mood_score', 'study_hours', 'sleep_hours']
+        trend_means = [
+            _group_means(date_idx, data[col].to_numpy(dtype=np.float64), len(dates)).tolist()
+            for col in trend_columns
+        ]
+        time_trends = [
+            {'recorded_date': date, **dict(zip(trend_columns, means))}
+            for date, *means in zip(pd.DatetimeIndex(dates).strftime('%Y-%m-%d'), *trend_means)
+        ]
         
         # Identify concerning cases
         concerning = data[data['mood_score'] <= 2][
@@ -223,13 +286,25 @@ class AnalyticsService:
     
     def get_stress_marks_correlation(self) -> Dict[str, Any]:
         """Analyze correlation between mental health indicators and academic performance"""
-        data = get_aggregated_student_data()
+        return self._cached(
+            ('stress_marks_correlation',),
+            lambda: self._stress_marks_correlation(get_aggregated_student_arrays())
+        )
+    
+    def _stress_marks_correlation(self, arrays: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        # One correlation matrix over all columns instead of a pass per pair
+        with np.errstate(divide='ignore', invalid='ignore'):
+            matrix = np.corrcoef(np.stack([arrays[col] for col in AGGREGATED_NUMERIC_COLUMNS]))
+        position = {col: i for i, col in enumerate(AGGREGATED_NUMERIC_COLUMNS)}
+        
+        def corr(x: str, y: str) -> float:
+            return round(float(matrix[position[x], position[y]]), 3)
         
         correlations = {
-            'mood_vs_marks': round(data['avg_mood'].corr(data['avg_marks']), 3),
-            'sleep_vs_marks': round(data['avg_sleep_hours'].corr(data['avg_marks']), 3),
-            'study_vs_marks': round(data['avg_study_hours'].corr(data['avg_marks']), 3),
-            'mood_vs_attendance': round(data['avg_mood'].corr(data['avg_attendance']), 3)
+            'mood_vs_marks': corr('avg_mood', 'avg_marks'),
+            'sleep_vs_marks': corr('avg_sleep_hours', 'avg_marks'),
+            'study_vs_marks': corr('avg_study_hours', 'avg_marks'),
+            'mood_vs_attendance': corr('avg_mood', 'avg_attendance')
         }
         
         # Interpretation
@@ -244,9 +319,48 @@ class AnalyticsService:
             'insights': self._generate_insights(correlations)
         }
     
+    def get_dashboard_bundle(self, role: str, department: str = None) -> Dict[str, Any]:
+        """Get every section of a teacher or counselor dashboard in one pass"""
+        if role not in (UserRole.TEACHER, UserRole.COUNSELOR):
+            raise ValueError(f"No dashboard for role: {role}")
+        return self._cached(
+            ('dashboard', role, department),
+            lambda: self._build_dashboard(role, department)
+        )
+    
+    def _build_dashboard(self, role: str, department: str = None) -> Dict[str, Any]:
+        # Each role loads and cleans only the frames its own sections read
+        if role == UserRole.TEACHER:
+            return {
+                'class_analytics': self._class_analytics(get_aggregated_student_data(), department),
+                'subject_analytics': self.get_subject_summary(),
+                'attendance_correlation': self._attendance_marks_correlation(clean_academic_data(load_academics()))
+            }
+        
+        return {
+            'mental_health': self._mental_health_trends(self._load_mental_health_frame(), department),
+            'stress_correlation': self._stress_marks_correlation(get_aggregated_student_arrays()),
+            'at_risk_students': self.get_at_risk_students(department)['students'],
+            'department_summary': self.get_department_summary()
+        }
+    
+    def _load_mental_health_frame(self) -> pd.DataFrame:
+        mental_health = clean_mental_health_data(load_mental_health())
+        students = load_students()
+        
+        # Merge with student info
+        return mental_health.merge(students[['student_id', 'department']], on='student_id')
+    
     def get_department_summary(self) -> List[Dict[str, Any]]:
         """Get summary statistics by department"""
-        return get_department_analytics()
+        return self._cached(('department_summary',), get_department_analytics)
+    
+    def get_at_risk_students(self, department: str = None) -> Dict[str, Any]:
+        """Get high-risk students and the risk distribution without loading every student"""
+        def load():
+            students, distribution = get_at_risk_students(department)
+            return {'students': students, 'risk_distribution': distribution}
+        return self._cached(('at_risk', department), load)
     
     def get_subject_summary(self) -> List[Dict[str, Any]]:
         """Get summary statistics by subject"""
@@ -3,39 +3,49 @@ Student Performance & Mental Health Dashboard API
 Main application entry point
 """
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from contextlib import asynccontextmanager
-import sys
-from pathlib import Path
-
-# Add parent directory to path for imports
-sys.path.insert(0, str(Path(__file__).parent))
 
 from routes import student_router, analytics_router, ml_router, auth_router, counseling_router, chat_router
-from services import MLService
-from database import engine, Base
+from services import AnalyticsService, MLService
+from services.auth_service import calibrate_bcrypt_rounds
+from database import engine, async_engine, Base, ensure_indexes
+from preprocessing import get_aggregated_student_arrays
 import models.sql_models
 
-# Create database tables (moved to lifespan)
-
 
 # Lifespan context manager for startup/shutdown events
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Train ML models
-    print("🚀 Starting up...")
-    
-    # Initialize DB with some data if needed (optional)
-    
     # Startup
     print("🚀 Starting up...")
     models.sql_models.Base.metadata.create_all(bind=engine)
+    ensure_indexes()
+    print(f"🔐 bcrypt cost: {calibrate_bcrypt_rounds()}")
+    # Shared service instances, handed to the routes through dependencies.py
+    app.state.analytics_service = AnalyticsService()
+    # Load the saved models, or train them now, so no request has to.
+    # Loading and training block, so they run off the event loop.
+    ml_service = await run_in_threadpool(MLService)
+    if not ml_service.is_trained:
+        print("🤖 No saved models, training...")
+        try:
+            await run_in_threadpool(ml_service.train_models)
+        except Exception as e:
+            # Predictions answer 503 until /ml/train succeeds
+            print(f"⚠️ Model training failed: {e}")
+    app.state.ml_service = ml_service
+    # Warm the shared aggregated student data before the first analytics request
+    get_aggregated_student_arrays()
     print("🎉 API is ready!")
     
     yield  # Application runs here
     
     # Shutdown
     print("👋 Shutting down...")
+    await async_engine.dispose()
 
 
 # Create FastAPI application
@@ -43,7 +53,8 @@ app = FastAPI(
     title="AI-Powered Student Dashboard",
     description="Comprehensive Platform for Academic & Mental Health Analytics",
     version="2.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS for frontend access
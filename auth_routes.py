@@ -1,17 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select, bindparam
 from sqlalchemy.orm import Session
-from database import get_db
-from models.sql_models import User
-from schemas import UserCreate, UserLogin, Token, UserResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, get_async_db
+from models.sql_models import User, UserRole
+from schemas import UserCreate, UserLogin, Token, UserResponse, RefreshRequest
 from services.auth_service import AuthService
+from preprocessing import invalidate_data_cache
 from fastapi.security import OAuth2PasswordBearer
+from functools import lru_cache
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+# Built once so every authenticated request reuses the statement and its cache key
+_USER_BY_EMAIL = select(User).where(User.email == bindparam("email"))
+
 @router.post("/signup", response_model=UserResponse)
 def signup(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
+    db_user = db.scalar(_USER_BY_EMAIL, {"email": user.email})
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
@@ -25,39 +32,59 @@ def signup(user: UserCreate, db: Session = Depends(get_db)):
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    invalidate_data_cache()
     return new_user
 
 @router.post("/login", response_model=Token)
 def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
     print(f"Login attempt for: {user_credentials.email}")
-    user = db.query(User).filter(User.email == user_credentials.email).first()
+    user = db.scalar(_USER_BY_EMAIL, {"email": user_credentials.email})
     
+    is_valid = False
     if not user:
         print(f"User not found: {user_credentials.email}")
+        AuthService.dummy_verify(user_credentials.password)
     else:
         is_valid = AuthService.verify_password(user_credentials.password, user.hashed_password)
         print(f"User found: {user.email}, Role: {user.role}, Password Valid: {is_valid}")
         # print(f"Stored Hash: {user.hashed_password}") # Check hash if needed
 
-    if not user or not AuthService.verify_password(user_credentials.password, user.hashed_password):
+    if not is_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token = AuthService.create_access_token(
-        data={"sub": user.email, "role": user.role, "user_id": user.id}
-    )
+    return _issue_tokens(user)
+
+@router.post("/refresh", response_model=Token)
+def refresh(request: RefreshRequest, db: Session = Depends(get_db)):
+    """Exchange a refresh token for a new access token without re-checking the password"""
+    payload = AuthService.decode_token(request.refresh_token, token_type="refresh")
+    user = None
+    if payload is not None and payload.get("sub") is not None:
+        user = db.scalar(_USER_BY_EMAIL, {"email": payload["sub"]})
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return _issue_tokens(user, refresh_token=request.refresh_token)
+
+def _issue_tokens(user: User, refresh_token: str = None):
+    claims = {"sub": user.email, "role": user.role, "user_id": user.id}
     return {
-        "access_token": access_token, 
+        "access_token": AuthService.create_access_token(data=claims), 
+        "refresh_token": refresh_token or AuthService.create_refresh_token(data=claims),
         "token_type": "bearer", 
         "role": user.role,
         "user_id": user.id,
         "name": user.name
     }
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     payload = AuthService.decode_token(token)
     if payload is None:
         raise HTTPException(
@@ -72,14 +99,20 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    user = db.query(User).filter(User.email == email).first()
+    user = await db.scalar(_USER_BY_EMAIL, {"email": email})
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 def check_role(roles: list):
+    # Normalize so callers may pass either role strings or UserRole members
+    return _role_checker(frozenset(UserRole(getattr(role, "value", role)) for role in roles))
+
+@lru_cache(maxsize=None)
+def _role_checker(allowed: frozenset):
+    """One shared dependency per distinct role set, so FastAPI can dedupe it"""
     def role_checker(user: User = Depends(get_current_user)):
-        if user.role not in roles:
+        if user.role not in allowed:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not enough permissions"
@@ -1,6 +1,13 @@
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
+import jwt
+from jwt import PyJWTError
+from cachetools import TTLCache, TLRUCache
+from functools import lru_cache
+import hashlib
+import hmac
+import threading
+import time
 import bcrypt
 import os
 from dotenv import load_dotenv
@@ -11,6 +18,62 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "your-super-secret-key-change-this")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 # 24 hours
+REFRESH_TOKEN_EXPIRE_DAYS = 7
+# Work factor for new hashes; existing hashes keep the cost they were created with.
+# Without an explicit setting, calibrate_bcrypt_rounds picks it at startup.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_MIN_ROUNDS = 10
+BCRYPT_MAX_ROUNDS = 14
+BCRYPT_TARGET_SECONDS = 0.25
+
+# Successful checks from the last few seconds, so a burst of logins by the same
+# user pays for bcrypt once. Maps the stored hash to the SHA-256 digest of the
+# password that matched it, so a password change never matches an old entry.
+VERIFY_CACHE_TTL_SECONDS = 5
+_verify_cache = TTLCache(maxsize=1024, ttl=VERIFY_CACHE_TTL_SECONDS)
+_verify_cache_lock = threading.Lock()
+
+# Verified token payloads, keyed by the token's SHA-256 digest. An entry
+# lives for TOKEN_CACHE_TTL_SECONDS or until the token expires, whichever
+# comes first; failed decodes are never stored.
+TOKEN_CACHE_TTL_SECONDS = 30
+
+def _token_cache_expiry(key, payload, now):
+    return min(now + TOKEN_CACHE_TTL_SECONDS, payload.get("exp", now))
+
+_token_cache = TLRUCache(maxsize=10_000, ttu=_token_cache_expiry, timer=time.time)
+_token_cache_lock = threading.Lock()
+
+def calibrate_bcrypt_rounds() -> int:
+    """Pick the highest bcrypt cost that hashes within BCRYPT_TARGET_SECONDS on this machine.
+    An explicit BCRYPT_ROUNDS setting always wins."""
+    global BCRYPT_ROUNDS
+    if os.getenv("BCRYPT_ROUNDS"):
+        return BCRYPT_ROUNDS
+    start = time.perf_counter()
+    bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds=BCRYPT_MIN_ROUNDS))
+    elapsed = time.perf_counter() - start
+    rounds = BCRYPT_MIN_ROUNDS
+    # Each extra round doubles the work
+    while rounds < BCRYPT_MAX_ROUNDS and elapsed * 2 <= BCRYPT_TARGET_SECONDS:
+        rounds += 1
+        elapsed *= 2
+    BCRYPT_ROUNDS = rounds
+    return rounds
+
+def safe_eq(a, b) -> bool:
+    """Constant-time equality for secret material (tokens, digests, hashes).
+    Never compare secrets with ==, which returns at the first differing byte."""
+    if isinstance(a, str):
+        a = a.encode('utf-8')
+    if isinstance(b, str):
+        b = b.encode('utf-8')
+    return hmac.compare_digest(a, b)
+
+@lru_cache(maxsize=1)
+def _dummy_hash() -> bytes:
+    # Created on first use with the same cost as real hashes
+    return bcrypt.hashpw(b"dummy-password", bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
 
 class AuthService:
     @staticmethod
@@ -24,17 +87,34 @@ class AuthService:
         else:
             hashed_bytes = hashed_password
             
+        password_digest = hashlib.sha256(password_bytes).digest()
+        with _verify_cache_lock:
+            cached_digest = _verify_cache.get(hashed_bytes)
+        if cached_digest is not None and safe_eq(cached_digest, password_digest):
+            return True
+
         try:
-            return bcrypt.checkpw(password_bytes, hashed_bytes)
+            is_valid = bcrypt.checkpw(password_bytes, hashed_bytes)
         except Exception:
             return False
+        if is_valid:
+            with _verify_cache_lock:
+                _verify_cache[hashed_bytes] = password_digest
+        return is_valid
+
+    @staticmethod
+    def dummy_verify(plain_password):
+        """Spend the same bcrypt time as a real check, for logins with an unknown email,
+        so response latency does not reveal whether the account exists"""
+        bcrypt.checkpw(plain_password.encode('utf-8'), _dummy_hash())
+        return False
 
     @staticmethod
     def get_password_hash(password):
         # bcrypt needs bytes
         password_bytes = password.encode('utf-8')
         # Generate salt and hash
-        salt = bcrypt.gensalt()
+        salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
         hashed = bcrypt.hashpw(password_bytes, salt)
         # Store as string in DB
         return hashed.decode('utf-8')
@@ -51,9 +131,28 @@ class AuthService:
         return encoded_jwt
 
     @staticmethod
-    def decode_token(token: str):
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            return payload
-        except JWTError:
+    def create_refresh_token(data: dict):
+        """Long-lived token that can only be exchanged for new access tokens"""
+        to_encode = data.copy()
+        expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+        to_encode.update({"exp": expire, "type": "refresh"})
+        return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+    @staticmethod
+    def decode_token(token: str, token_type: str = "access"):
+        cache_key = hashlib.sha256(token.encode('utf-8')).digest()
+        with _token_cache_lock:
+            payload = _token_cache.get(cache_key)
+        if payload is None:
+            try:
+                payload = jwt.decode(
+                    token, SECRET_KEY, algorithms=[ALGORITHM], options={"require": ["exp"]}
+                )
+            except PyJWTError:
+                return None
+            with _token_cache_lock:
+                _token_cache[cache_key] = payload
+        # Access tokens carry no type claim
+        if payload.get("type", "access") != token_type:
             return None
+        return payload
@@ -1,51 +1,75 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 from models.sql_models import User, ChatMessage, UserRole
 from schemas import ChatMessageCreate, ChatMessageResponse
 from routes.auth_routes import get_current_user
-from typing import List
-from sqlalchemy import or_, and_
+from typing import List, Optional
+from datetime import datetime
+from sqlalchemy import select, insert, or_, and_, bindparam
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
+# History statements are built once at import; requests only bind values, so
+# SQLAlchemy reuses the statement's cache key and compiled SQL every time.
+# Newest page first from the (sender, receiver, timestamp) index.
+_CONVERSATION = or_(
+    and_(ChatMessage.sender_id == bindparam("me"), ChatMessage.receiver_id == bindparam("other")),
+    and_(ChatMessage.sender_id == bindparam("other"), ChatMessage.receiver_id == bindparam("me"))
+)
+_HISTORY_STMT = (
+    select(ChatMessage)
+    .where(_CONVERSATION)
+    .order_by(ChatMessage.timestamp.desc())
+    .limit(bindparam("limit"))
+)
+_HISTORY_BEFORE_STMT = (
+    select(ChatMessage)
+    .where(_CONVERSATION, ChatMessage.timestamp < bindparam("before"))
+    .order_by(ChatMessage.timestamp.desc())
+    .limit(bindparam("limit"))
+)
+
 @router.post("/send", response_model=ChatMessageResponse)
-def send_message(
+async def send_message(
     msg: ChatMessageCreate, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_async_db), 
     current_user: User = Depends(get_current_user)
 ):
-    new_msg = ChatMessage(
+    # RETURNING hands back the generated id and timestamp with the insert itself
+    new_msg = await db.scalar(insert(ChatMessage).values(
         sender_id=current_user.id,
         receiver_id=msg.receiver_id,
         message=msg.message
-    )
-    db.add(new_msg)
-    db.commit()
-    db.refresh(new_msg)
+    ).returning(ChatMessage))
+    await db.commit()
     return new_msg
 
 @router.get("/history/{other_user_id}", response_model=List[ChatMessageResponse])
-def get_chat_history(
+async def get_chat_history(
     other_user_id: int, 
-    db: Session = Depends(get_db), 
+    before: Optional[datetime] = Query(None, description="Only messages sent before this time, for loading older pages"),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db), 
     current_user: User = Depends(get_current_user)
 ):
-    history = db.query(ChatMessage).filter(
-        or_(
-            and_(ChatMessage.sender_id == current_user.id, ChatMessage.receiver_id == other_user_id),
-            and_(ChatMessage.sender_id == other_user_id, ChatMessage.receiver_id == current_user.id)
-        )
-    ).order_by(ChatMessage.timestamp.asc()).all()
-    return history
+    params = {"me": current_user.id, "other": other_user_id, "limit": limit}
+    if before is None:
+        history = await db.scalars(_HISTORY_STMT, params)
+    else:
+        history = await db.scalars(_HISTORY_BEFORE_STMT, {**params, "before": before})
+    # Returned oldest first like the full history was
+    return history.all()[::-1]
 
 @router.get("/contacts", response_model=List[dict])
-def get_chat_contacts(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def get_chat_contacts(db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     # Students can see counselors and maybe teachers
     # Counselors/Teachers can see all students
+    # Only the projected columns, without loading full User objects
+    query = select(User.id, User.name, User.role)
     if current_user.role == UserRole.STUDENT:
-        contacts = db.query(User).filter(User.role != UserRole.STUDENT).all()
+        contacts = await db.execute(query.where(User.role != UserRole.STUDENT))
     else:
-        contacts = db.query(User).filter(User.role == UserRole.STUDENT).all()
+        contacts = await db.execute(query.where(User.role == UserRole.STUDENT))
     
     return [{"id": c.id, "name": c.name, "role": c.role} for c in contacts]
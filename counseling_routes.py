@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy import select, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 from models.sql_models import User, CounselorRemark, CounselingRequest, UserRole, CounselingRequestStatus
 from schemas import CounselorRemarkCreate, CounselorRemarkResponse, CounselingRequestCreate, CounselingRequestUpdate, CounselingRequestResponse
 from routes.auth_routes import get_current_user, check_role
@@ -10,65 +11,64 @@ router = APIRouter(prefix="/counseling", tags=["Counseling"])
 
 # --- Remarks ---
 @router.post("/remarks", response_model=CounselorRemarkResponse)
-def add_remark(
+async def add_remark(
     remark: CounselorRemarkCreate, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_async_db), 
     current_user: User = Depends(check_role([UserRole.COUNSELOR, UserRole.TEACHER]))
 ):
-    new_remark = CounselorRemark(
+    new_remark = await db.scalar(insert(CounselorRemark).values(
         student_id=remark.student_id,
         counselor_id=current_user.id,
         remarks=remark.remarks
-    )
-    db.add(new_remark)
-    db.commit()
-    db.refresh(new_remark)
+    ).returning(CounselorRemark))
+    await db.commit()
     return new_remark
 
 @router.get("/remarks/{student_id}", response_model=List[CounselorRemarkResponse])
-def get_student_remarks(student_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def get_student_remarks(student_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     # Students can see their own remarks, teachers/counselors can see all
     if current_user.role == UserRole.STUDENT and current_user.id != student_id:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    return db.query(CounselorRemark).filter(CounselorRemark.student_id == student_id).all()
+    remarks = await db.scalars(select(CounselorRemark).where(CounselorRemark.student_id == student_id))
+    return remarks.all()
 
 # --- Requests ---
 @router.post("/requests", response_model=CounselingRequestResponse)
-def create_request(
+async def create_request(
     request: CounselingRequestCreate, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_async_db), 
     current_user: User = Depends(check_role([UserRole.STUDENT]))
 ):
-    new_request = CounselingRequest(
+    new_request = await db.scalar(insert(CounselingRequest).values(
         student_id=current_user.id,
         counselor_id=request.counselor_id,
         status=CounselingRequestStatus.PENDING
-    )
-    db.add(new_request)
-    db.commit()
-    db.refresh(new_request)
+    ).returning(CounselingRequest))
+    await db.commit()
     return new_request
 
 @router.get("/requests", response_model=List[CounselingRequestResponse])
-def get_requests(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def get_requests(db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    # Plain column rows are all the response needs; skip building ORM objects
+    query = select(*CounselingRequest.__table__.columns)
     if current_user.role == UserRole.STUDENT:
-        return db.query(CounselingRequest).filter(CounselingRequest.student_id == current_user.id).all()
+        query = query.where(CounselingRequest.student_id == current_user.id)
     elif current_user.role == UserRole.COUNSELOR:
-        return db.query(CounselingRequest).filter(
+        query = query.where(
             (CounselingRequest.counselor_id == current_user.id) | (CounselingRequest.counselor_id == None)
-        ).all()
-    else:
-        return db.query(CounselingRequest).all()
+        )
+    requests = await db.execute(query)
+    return requests.all()
 
 @router.patch("/requests/{request_id}", response_model=CounselingRequestResponse)
-def update_request_status(
+async def update_request_status(
     request_id: int, 
     update: CounselingRequestUpdate, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_async_db), 
     current_user: User = Depends(check_role([UserRole.COUNSELOR]))
 ):
-    req = db.query(CounselingRequest).filter(CounselingRequest.id == request_id).first()
+    req = await db.get(CounselingRequest, request_id)
     if not req:
         raise HTTPException(status_code=404, detail="Request not found")
     
@@ -76,11 +76,11 @@ def update_request_status(
     if not req.counselor_id:
         req.counselor_id = current_user.id
         
-    db.commit()
-    db.refresh(req)
+    # Sessions keep attributes after commit, so req already holds the new values
+    await db.commit()
     return req
 
 @router.post("/call/{student_id}")
-def log_call(student_id: int, db: Session = Depends(get_db), current_user: User = Depends(check_role([UserRole.COUNSELOR, UserRole.TEACHER]))):
+async def log_call(student_id: int, current_user: User = Depends(check_role([UserRole.COUNSELOR, UserRole.TEACHER]))):
     # Simulated call logging
     return {"message": f"Call to student {student_id} logged by {current_user.name}"}
@@ -6,6 +6,7 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
+from functools import lru_cache
 import pandas as pd
 from pathlib import Path
 
@@ -13,6 +14,7 @@ router = APIRouter(prefix="/counselor", tags=["Counselor"])
 
 DATA_DIR = Path(__file__).parent.parent / "data"
 REMARKS_FILE = DATA_DIR / "counselor_remarks.csv"
+REMARK_COLUMNS = ['student_id', 'counselor_name', 'remark', 'created_at', 'category']
 
 
 class RemarkCreate(BaseModel):
@@ -30,11 +32,26 @@ class RemarkResponse(BaseModel):
     category: str
 
 
+@lru_cache(maxsize=1)
+def _read_remarks(mtime_ns: int, size: int):
+    # student_id is a string everywhere else in this module
+    return pd.read_csv(REMARKS_FILE, dtype={'student_id': str})
+
+
 def load_remarks():
-    """Load remarks from CSV file"""
+    """Load remarks from CSV file, reparsing only after the file changes.
+    The DataFrame is shared between requests, so do not modify it in place."""
     if REMARKS_FILE.exists():
-        return pd.read_csv(REMARKS_FILE)
-    return pd.DataFrame(columns=['student_id', 'counselor_name', 'remark', 'created_at', 'category'])
+        stat = REMARKS_FILE.stat()
+        return _read_remarks(stat.st_mtime_ns, stat.st_size)
+    return pd.DataFrame(columns=REMARK_COLUMNS)
+
+
+def append_remark(remark: dict):
+    """Append a single remark to the CSV file instead of rewriting it"""
+    pd.DataFrame([remark], columns=REMARK_COLUMNS).to_csv(
+        REMARKS_FILE, mode='a', header=not REMARKS_FILE.exists(), index=False
+    )
 
 
 def save_remarks(df):
@@ -82,8 +99,6 @@ async def get_student_remarks(student_id: str):
 async def create_remark(remark_data: RemarkCreate):
     """Create a new counselor remark for a student"""
     try:
-        remarks = load_remarks()
-        
         new_remark = {
             'student_id': remark_data.student_id,
             'counselor_name': remark_data.counselor_name,
@@ -92,11 +107,7 @@ async def create_remark(remark_data: RemarkCreate):
             'category': remark_data.category
         }
         
-        # Create new DataFrame with the new remark
-        new_df = pd.DataFrame([new_remark])
-        remarks = pd.concat([remarks, new_df], ignore_index=True)
-        
-        save_remarks(remarks)
+        append_remark(new_remark)
         
         return {
             "success": True,
@@ -1,44 +1,237 @@
+from sqlalchemy import select, func, case, literal, true, bindparam
 from sqlalchemy.orm import Session
 from models.sql_models import User, StudentAcademicData, StudentBehaviorData, UserRole
+from models.ml_models import FEATURE_NAMES
+from cachetools import TTLCache
+import functools
+import threading
 import pandas as pd
 import numpy as np
-from database import SessionLocal
+from database import SessionLocal, engine
+
+# Students have no department column yet; every student is reported under this one
+DEFAULT_DEPARTMENT = "Computer Science"
+
+AGGREGATED_NUMERIC_COLUMNS = ['avg_marks', 'avg_mood', 'avg_attendance', 'avg_sleep_hours', 'avg_study_hours']
+
+# Behavior feature values for students without any check-ins
+BEHAVIOR_FEATURE_DEFAULTS = {'avg_mood': 3.0, 'avg_study_hours': 5.0, 'avg_sleep_hours': 6.0}
+
+# Decoded DataFrames shared by the analytics endpoints. Entries are keyed by
+# (loader, data version) so a write only has to bump the version; the TTL
+# bounds staleness for writes made by other worker processes.
+FRAME_CACHE_TTL_SECONDS = 60
+_frame_cache = TTLCache(maxsize=16, ttl=FRAME_CACHE_TTL_SECONDS)
+_frame_cache_lock = threading.Lock()
+_data_version = 0
+
+# Per-student prediction features, so dashboards polling /ml/predict and
+# /ml/risk skip the database. Each entry holds the named features for display
+# and the model input row built from them. Writes for a student drop its entry.
+FEATURE_CACHE_TTL_SECONDS = 30
+_feature_cache = TTLCache(maxsize=5000, ttl=FEATURE_CACHE_TTL_SECONDS)
+_feature_cache_lock = threading.Lock()
 
 def get_db_session():
     return SessionLocal()
 
-def prepare_features_for_prediction(student_id: str, db: Session = None) -> dict:
-    """Prepare feature set for a specific student for ML prediction from DB"""
+def get_data_version() -> int:
+    """Current version of the student tables, bumped on every write"""
+    return _data_version
+
+def invalidate_data_cache():
+    """Drop cached frames after students, academic or behavior rows change"""
+    global _data_version
+    with _frame_cache_lock:
+        _data_version += 1
+        _frame_cache.clear()
+
+def invalidate_student_features(student_id):
+    """Drop a student's cached prediction features after their data changes"""
+    with _feature_cache_lock:
+        _feature_cache.pop(int(student_id), None)
+
+def _cached_frame(loader):
+    """Memoize a DataFrame loader per data version. Callers must not mutate the result."""
+    @functools.wraps(loader)
+    def wrapper():
+        key = (loader.__name__, _data_version)
+        with _frame_cache_lock:
+            df = _frame_cache.get(key)
+        if df is None:
+            df = loader()
+            with _frame_cache_lock:
+                _frame_cache[key] = df
+        return df
+    return wrapper
+
+# Both aggregates come back in one row and one round trip; an aggregate
+# without GROUP BY always yields exactly one row, even with no data.
+# Built once at import so each lookup only binds the student id.
+_academic_features = select(
+    func.count(StudentAcademicData.id).label('academic_rows'),
+    func.avg(StudentAcademicData.marks).label('avg_marks'),
+    func.avg(StudentAcademicData.attendance).label('avg_attendance'),
+    func.avg(StudentAcademicData.assignment_scores).label('avg_assignment')
+).where(StudentAcademicData.student_id == bindparam('sid')).subquery()
+_behavior_features = select(
+    func.avg(StudentBehaviorData.mood_score).label('avg_mood'),
+    func.avg(StudentBehaviorData.study_hours).label('avg_study_hours'),
+    func.avg(StudentBehaviorData.sleep_hours).label('avg_sleep_hours')
+).where(StudentBehaviorData.student_id == bindparam('sid')).subquery()
+_STUDENT_FEATURES_STMT = select(_academic_features, _behavior_features).select_from(
+    _academic_features.join(_behavior_features, true())
+)
+
+def prepare_features_for_prediction(student_id: str, db: Session = None, use_cache: bool = True) -> np.ndarray:
+    """Model input for a specific student from DB: a read-only (1, n_features)
+    float32 row in FEATURE_NAMES order, or None without academic data.
+    Pass use_cache=False when db holds uncommitted rows for the student."""
+    entry = _student_features(student_id, db, use_cache)
+    return entry[1] if entry else None
+
+def prepare_features_for_display(student_id: str, db: Session = None, use_cache: bool = True) -> dict:
+    """The same features by name, for responses, or None without academic data"""
+    entry = _student_features(student_id, db, use_cache)
+    # A copy, since callers may add keys to the result
+    return dict(entry[0]) if entry else None
+
+def _student_features(student_id: str, db: Session = None, use_cache: bool = True):
+    """(features dict, model input row) for a student, from the cache when allowed"""
+    sid = int(student_id)
+    if use_cache:
+        with _feature_cache_lock:
+            entry = _feature_cache.get(sid)
+        if entry is not None:
+            return entry
+    
+    features = _query_student_features(sid, db)
+    if features is None:
+        return None
+    row = np.array([[features[name] for name in FEATURE_NAMES]], dtype=np.float32)
+    # Shared between requests through the cache
+    row.setflags(write=False)
+    entry = (features, row)
+    if use_cache:
+        with _feature_cache_lock:
+            _feature_cache[sid] = entry
+    return entry
+
+def _query_student_features(sid: int, db: Session = None) -> dict:
     should_close = False
     if db is None:
         db = SessionLocal()
         should_close = True
         
     try:
-        # Get latest academic and behavior data
-        academics = db.query(StudentAcademicData).filter(StudentAcademicData.student_id == int(student_id)).all()
-        behavior = db.query(StudentBehaviorData).filter(StudentBehaviorData.student_id == int(student_id)).all()
+        row = db.execute(_STUDENT_FEATURES_STMT, {'sid': sid}).one()
         
-        if not academics:
+        if not row.academic_rows:
             return None
-            
-        df_ac = pd.DataFrame([{"marks": a.marks, "attendance": a.attendance, "assignment": a.assignment_scores} for a in academics])
-        df_bh = pd.DataFrame([{"mood": b.mood_score, "sleep": b.sleep_hours, "study": b.study_hours} for b in behavior])
         
+        # Plain floats so the features serialize without numpy scalar support
         features = {
-            'avg_marks': df_ac['marks'].mean(),
-            'avg_attendance': df_ac['attendance'].mean(),
-            'avg_assignment': df_ac['assignment'].mean(),
-            'avg_internal': df_ac['marks'].mean(), # Using marks as proxy if internal not separate
-            'avg_mood': df_bh['mood'].mean() if not df_bh.empty else 3,
-            'avg_study_hours': df_bh['study'].mean() if not df_bh.empty else 5,
-            'avg_sleep_hours': df_bh['sleep'].mean() if not df_bh.empty else 6
+            'avg_marks': float(row.avg_marks),
+            'avg_attendance': float(row.avg_attendance),
+            'avg_assignment': float(row.avg_assignment),
+            'avg_internal': float(row.avg_marks), # Using marks as proxy if internal not separate
         }
+        for name, default in BEHAVIOR_FEATURE_DEFAULTS.items():
+            value = getattr(row, name)
+            features[name] = float(value) if value is not None else default
         return features
     finally:
         if should_close:
             db.close()
 
+# Per-student feature rows for a list of students in one grouped query, with
+# columns in model input order and behavior defaults filled in by the database
+_batch_academic = select(
+    StudentAcademicData.student_id,
+    func.avg(StudentAcademicData.marks).label('avg_marks'),
+    func.avg(StudentAcademicData.attendance).label('avg_attendance'),
+    func.avg(StudentAcademicData.assignment_scores).label('avg_assignment')
+).where(
+    StudentAcademicData.student_id.in_(bindparam('ids', expanding=True))
+).group_by(StudentAcademicData.student_id).subquery()
+_batch_behavior = select(
+    StudentBehaviorData.student_id,
+    func.avg(StudentBehaviorData.mood_score).label('avg_mood'),
+    func.avg(StudentBehaviorData.study_hours).label('avg_study_hours'),
+    func.avg(StudentBehaviorData.sleep_hours).label('avg_sleep_hours')
+).where(
+    StudentBehaviorData.student_id.in_(bindparam('ids', expanding=True))
+).group_by(StudentBehaviorData.student_id).subquery()
+_batch_feature_columns = {
+    'avg_attendance': _batch_academic.c.avg_attendance,
+    'avg_assignment': _batch_academic.c.avg_assignment,
+    'avg_internal': _batch_academic.c.avg_marks, # Using marks as proxy if internal not separate
+    **{
+        name: func.coalesce(_batch_behavior.c[name], default)
+        for name, default in BEHAVIOR_FEATURE_DEFAULTS.items()
+    }
+}
+_BATCH_FEATURES_STMT = select(
+    _batch_academic.c.student_id,
+    *(_batch_feature_columns[name].label(name) for name in FEATURE_NAMES)
+).select_from(
+    _batch_academic.outerjoin(_batch_behavior, _batch_behavior.c.student_id == _batch_academic.c.student_id)
+)
+
+def prepare_features_for_prediction_batch(student_ids: list, db: Session = None):
+    """Prediction features for many students with a single query.
+    Returns the ids that have academic data, in request order, and their
+    (n_students, n_features) float32 matrix in FEATURE_NAMES order."""
+    should_close = False
+    if db is None:
+        db = SessionLocal()
+        should_close = True
+    
+    try:
+        sids = [int(sid) for sid in student_ids]
+        rows = db.execute(_BATCH_FEATURES_STMT, {'ids': list(set(sids))}).all() if sids else []
+    finally:
+        if should_close:
+            db.close()
+    
+    position = {row.student_id: i for i, row in enumerate(rows)}
+    matrix = np.array([row[1:] for row in rows], dtype=np.float32).reshape(len(rows), len(FEATURE_NAMES))
+    found = [(sid, position[int(sid)]) for sid in student_ids if int(sid) in position]
+    return [sid for sid, _ in found], matrix[[i for _, i in found]]
+
+def _student_feature_frame(db: Session) -> pd.DataFrame:
+    """Prediction features for every student with academic data, in two grouped queries"""
+    academics = (
+        db.query(
+            StudentAcademicData.student_id,
+            User.name,
+            func.avg(StudentAcademicData.marks).label('avg_marks'),
+            func.avg(StudentAcademicData.attendance).label('avg_attendance'),
+            func.avg(StudentAcademicData.assignment_scores).label('avg_assignment')
+        )
+        .join(User, User.id == StudentAcademicData.student_id)
+        .filter(User.role == UserRole.STUDENT)
+        .group_by(StudentAcademicData.student_id, User.name)
+        .order_by(StudentAcademicData.student_id)
+        .all()
+    )
+    behavior = (
+        db.query(
+            StudentBehaviorData.student_id,
+            func.avg(StudentBehaviorData.mood_score).label('avg_mood'),
+            func.avg(StudentBehaviorData.study_hours).label('avg_study_hours'),
+            func.avg(StudentBehaviorData.sleep_hours).label('avg_sleep_hours')
+        )
+        .group_by(StudentBehaviorData.student_id)
+        .all()
+    )
+    df_ac = pd.DataFrame(academics, columns=['student_id', 'name', 'avg_marks', 'avg_attendance', 'avg_assignment'])
+    df_bh = pd.DataFrame(behavior, columns=['student_id', *BEHAVIOR_FEATURE_DEFAULTS])
+    
+    df = df_ac.merge(df_bh, on='student_id', how='left').fillna(BEHAVIOR_FEATURE_DEFAULTS)
+    df['avg_internal'] = df['avg_marks'] # Using marks as proxy if internal not separate
+    return df
+
 def prepare_training_data(db: Session = None):
     """Fetch all data from DB for training"""
     should_close = False
@@ -47,105 +240,204 @@ def prepare_training_data(db: Session = None):
         should_close = True
         
     try:
-        academics = db.query(StudentAcademicData).all()
-        behavior = db.query(StudentBehaviorData).all()
+        df = _student_feature_frame(db)
         
-        if not academics:
-            # Fallback to CSV if DB is empty (for initial training)
+        if df.empty:
             return None, None, None
-            
-        # Create DataFrames and aggregate
-        # This is a simplified version of the previous CSV logic
-        # In a real app, you'd join these tables
         
-        data_list = []
-        students = db.query(User).filter(User.role == UserRole.STUDENT).all()
-        for s in students:
-            features = prepare_features_for_prediction(str(s.id), db)
-            if features:
-                features['student_id'] = s.id
-                data_list.append(features)
-        
-        if not data_list:
-            return None, None, None
-            
-        df = pd.DataFrame(data_list)
-        
-        feature_cols = ['avg_attendance', 'avg_assignment', 'avg_internal', 
-                        'avg_mood', 'avg_study_hours', 'avg_sleep_hours']
-        X = df[feature_cols].values
+        X = df[list(FEATURE_NAMES)].values
         y_reg = df['avg_marks'].values
         
-        def classify_risk(row):
-            if row['avg_marks'] >= 75 and row['avg_mood'] >= 4:
-                return 0
-            elif row['avg_marks'] < 50 or row['avg_mood'] <= 2:
-                return 2
-            else:
-                return 1
-        
-        y_clf = df.apply(classify_risk, axis=1).values
+        # Risk labels: 0 = Low, 1 = Medium, 2 = High
+        marks = df['avg_marks'].to_numpy(dtype=np.float64)
+        mood = df['avg_mood'].to_numpy(dtype=np.float64)
+        y_clf = np.where(
+            (marks >= 75) & (mood >= 4), 0,
+            np.where((marks < 50) | (mood <= 2), 2, 1)
+        ).astype(np.int8)
         return X, y_reg, y_clf
     finally:
         if should_close:
             db.close()
 
 # Keep other functions but they might need updates if used
+def _read_frame(statement) -> pd.DataFrame:
+    """Run a select and let pandas build typed columns straight from the cursor,
+    skipping ORM objects and per-row dicts"""
+    with engine.connect() as conn:
+        return pd.read_sql_query(statement, conn)
+
+@_cached_frame
 def load_students():
-    db = SessionLocal()
-    users = db.query(User).filter(User.role == UserRole.STUDENT).all()
-    db.close()
-    return pd.DataFrame([{"student_id": u.id, "name": u.name, "email": u.email, "department": "Computer Science"} for u in users])
+    return _read_frame(
+        select(
+            User.id.label('student_id'),
+            User.name,
+            User.email,
+            literal(DEFAULT_DEPARTMENT).label('department')
+        ).where(User.role == UserRole.STUDENT)
+    )
 
+@_cached_frame
 def load_academics():
-    db = SessionLocal()
-    data = db.query(StudentAcademicData).all()
-    db.close()
-    return pd.DataFrame([{"student_id": d.student_id, "subject_marks": d.marks, "attendance_percentage": d.attendance, "subject": "General"} for d in data])
+    return _read_frame(
+        select(
+            StudentAcademicData.student_id,
+            StudentAcademicData.marks.label('subject_marks'),
+            StudentAcademicData.attendance.label('attendance_percentage'),
+            literal("General").label('subject')
+        )
+    )
 
+@_cached_frame
 def load_mental_health():
-    db = SessionLocal()
-    data = db.query(StudentBehaviorData).all()
-    db.close()
-    return pd.DataFrame([{"student_id": d.student_id, "mood_score": d.mood_score, "sleep_hours": d.sleep_hours, "study_hours": d.study_hours, "recorded_date": d.timestamp, "text_feedback": "Check-in entry"} for d in data])
+    return _read_frame(
+        select(
+            StudentBehaviorData.student_id,
+            StudentBehaviorData.mood_score,
+            StudentBehaviorData.sleep_hours,
+            StudentBehaviorData.study_hours,
+            StudentBehaviorData.timestamp.label('recorded_date'),
+            literal("Check-in entry").label('text_feedback')
+        )
+    )
 
+@_cached_frame
 def get_aggregated_student_data():
     # Helper for analytics
     db = SessionLocal()
-    students = db.query(User).filter(User.role == UserRole.STUDENT).all()
-    results = []
-    for s in students:
-        feat = prepare_features_for_prediction(str(s.id), db)
-        if feat:
-            feat['student_id'] = s.id
-            feat['name'] = s.name
-            results.append(feat)
-    db.close()
-    return pd.DataFrame(results)
+    try:
+        df = _student_feature_frame(db)
+    finally:
+        db.close()
+    if df.empty:
+        return pd.DataFrame()
+    df['department'] = DEFAULT_DEPARTMENT
+    return df
 def clean_academic_data(df):
-    """DB data is already typed, just ensuring DataFrame format"""
+    """DB data is already typed, just ensuring DataFrame format.
+    Marks and attendance stay float64: responses are built from these frames,
+    and float32 would turn 72.3 into 72.30000305175781."""
     if df is None or df.empty:
         return pd.DataFrame(columns=['student_id', 'subject', 'subject_marks', 'attendance_percentage'])
     return df
 
 def clean_mental_health_data(df):
-    """DB data is already typed, just ensuring DataFrame format"""
+    """DB data is already typed, just ensuring DataFrame format and a narrow mood dtype.
+    Hours stay float64 for the same reason as in clean_academic_data."""
     if df is None or df.empty:
         return pd.DataFrame(columns=['student_id', 'mood_score', 'sleep_hours', 'study_hours', 'recorded_date', 'text_feedback'])
+    # Mood is 1-5, exact in int8; keep it float if missing scores would not fit an integer column
+    if df['mood_score'].notna().all():
+        return df.astype({'mood_score': 'int8'})
     return df
 
+@_cached_frame
+def get_aggregated_student_arrays():
+    """Numeric aggregated student columns as float64 arrays"""
+    data = get_aggregated_student_data()
+    return {
+        col: data[col].to_numpy(dtype=np.float64) if col in data else np.empty(0)
+        for col in AGGREGATED_NUMERIC_COLUMNS
+    }
+
+@_cached_frame
+def load_academics_by_student():
+    """Cleaned academic data indexed by student_id for per-student lookups.
+    The sort is stable so each student's rows keep their database order."""
+    return clean_academic_data(load_academics()).set_index('student_id', drop=False).sort_index(kind='stable')
+
+@_cached_frame
+def load_mental_health_by_student():
+    """Cleaned mental health data indexed by student_id for per-student lookups,
+    each student's rows in date order"""
+    df = clean_mental_health_data(load_mental_health())
+    return df.sort_values(['student_id', 'recorded_date'], kind='stable').set_index('student_id', drop=False)
+
+def _student_averages():
+    """Per-student academic and mood averages as a subquery.
+    Students without check-ins get the neutral mood of 3, as in prepare_features_for_prediction."""
+    academic = (
+        select(
+            StudentAcademicData.student_id,
+            func.avg(StudentAcademicData.marks).label('avg_marks'),
+            func.avg(StudentAcademicData.attendance).label('avg_attendance')
+        )
+        .group_by(StudentAcademicData.student_id)
+        .subquery()
+    )
+    behavior = (
+        select(
+            StudentBehaviorData.student_id,
+            func.avg(StudentBehaviorData.mood_score).label('avg_mood')
+        )
+        .group_by(StudentBehaviorData.student_id)
+        .subquery()
+    )
+    return (
+        select(
+            User.id.label('student_id'),
+            User.name,
+            literal(DEFAULT_DEPARTMENT).label('department'),
+            academic.c.avg_marks,
+            academic.c.avg_attendance,
+            func.coalesce(behavior.c.avg_mood, 3).label('avg_mood')
+        )
+        .join(academic, academic.c.student_id == User.id)
+        .outerjoin(behavior, behavior.c.student_id == User.id)
+        .where(User.role == UserRole.STUDENT)
+        .subquery()
+    )
+
+def _is_high_risk(averages):
+    # Same rule as the 'High' risk level in the class analytics
+    return (averages.c.avg_marks < 50) | (averages.c.avg_mood <= 2)
+
 def get_department_analytics():
-    """Aggregate stats by department"""
+    """Aggregate stats by department, computed in the database"""
+    averages = _student_averages()
+    query = (
+        select(
+            averages.c.department,
+            func.count().label('total_students'),
+            func.avg(averages.c.avg_marks).label('avg_marks'),
+            func.avg(averages.c.avg_attendance).label('avg_attendance'),
+            func.avg(averages.c.avg_mood).label('avg_mood'),
+            func.sum(case((_is_high_risk(averages), 1), else_=0)).label('at_risk_count')
+        )
+        .group_by(averages.c.department)
+    )
     db = SessionLocal()
     try:
-        data = get_aggregated_student_data() # This already has department if we join it
-        if data.empty:
-            return []
-        
-        # Note: get_aggregated_student_data needs to include department
-        # Let's fix that in a moment.
-        # For now, return empty or dummy
-        return []
+        return [dict(row) for row in db.execute(query).mappings()]
+    finally:
+        db.close()
+
+def get_at_risk_students(department: str = None):
+    """High-risk students and the risk distribution, filtered in the database.
+    Returns (students, distribution); both are empty when no student matches."""
+    if department and department != DEFAULT_DEPARTMENT:
+        return [], {}
+    averages = _student_averages()
+    risk_level = case(
+        (_is_high_risk(averages), 'High'),
+        ((averages.c.avg_marks >= 70) & (averages.c.avg_mood >= 4), 'Low'),
+        else_='Medium'
+    ).label('risk_level')
+    students_query = (
+        select(
+            averages.c.student_id, averages.c.name, averages.c.department,
+            averages.c.avg_marks, averages.c.avg_mood
+        )
+        .where(_is_high_risk(averages))
+        .order_by(averages.c.student_id)
+    )
+    distribution_query = select(risk_level, func.count()).group_by(risk_level)
+    db = SessionLocal()
+    try:
+        students = [dict(row) for row in db.execute(students_query).mappings()]
+        distribution = {level: count for level, count in db.execute(distribution_query)}
+        return students, distribution
     finally:
         db.close()
 
@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -11,21 +13,63 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 default_db_url = f"sqlite:///{os.path.join(BASE_DIR, 'student_dashboard.db')}"
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", default_db_url)
 
+# Async driver used for each database type by the async engine
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+def _pool_options():
+    """Connection pool settings shared by the sync and async engines"""
+    if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+        return {}
+    if os.getenv("DB_USE_PGBOUNCER", "").lower() in ("1", "true", "yes"):
+        # PgBouncer already pools server connections; a second pool here would pin them
+        return {"poolclass": NullPool}
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "20")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": True,
+    }
+
+def _async_url(url: str) -> str:
+    scheme, rest = url.split("://", 1)
+    return f"{ASYNC_DRIVERS.get(scheme.split('+')[0], scheme)}://{rest}"
+
 # SQLite needs connect_args={"check_same_thread": False} for FastAPI
 if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
     engine = create_engine(
         SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
     )
 else:
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    engine = create_engine(SQLALCHEMY_DATABASE_URL, **_pool_options())
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for handlers that await the database instead of holding a worker thread.
+# Objects stay usable after commit so responses can be built from them.
+async_engine = create_async_engine(_async_url(SQLALCHEMY_DATABASE_URL), **_pool_options())
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
+def ensure_indexes():
+    """Create indexes declared on the models that an existing database is missing.
+    create_all only creates indexes together with new tables."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,14 @@
+"""
+Request dependencies for the shared service instances
+The services are created at startup and stored on app.state
+"""
+from fastapi import Request
+from services import AnalyticsService, MLService
+
+
+def get_analytics_service(request: Request) -> AnalyticsService:
+    return request.app.state.analytics_service
+
+
+def get_ml_service(request: Request) -> MLService:
+    return request.app.state.ml_service
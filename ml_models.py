@@ -7,13 +7,62 @@ from sklearn.linear_model import LinearRegression, LogisticRegression
 from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, r2_score, accuracy_score, classification_report
-from sklearn.preprocessing import StandardScaler
 import pickle
+import functools
 from pathlib import Path
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Tuple, List, Union
 
 MODEL_DIR = Path(__file__).parent
 
+# Model input columns in training order, with the value used when a feature is missing
+FEATURE_DEFAULTS = {
+    'avg_attendance': 0,
+    'avg_assignment': 0,
+    'avg_internal': 0,
+    'avg_mood': 3,
+    'avg_study_hours': 5,
+    'avg_sleep_hours': 6
+}
+
+# Column order of every model input matrix
+FEATURE_NAMES = tuple(FEATURE_DEFAULTS)
+
+
+def _feature_matrix(features_list: List[Dict[str, float]]) -> np.ndarray:
+    """Stack feature dicts into one (n_students, n_features) matrix"""
+    return np.array(
+        [[features.get(name, default) for name, default in FEATURE_DEFAULTS.items()] for features in features_list],
+        dtype=np.float32
+    )
+
+
+def _model_input(features_list: Union[List[Dict[str, float]], np.ndarray], scaler=None) -> np.ndarray:
+    """Feature matrix for prediction, from feature dicts or an already stacked matrix.
+    Tree splits don't depend on feature scale, so inputs go in unscaled; only
+    models saved with a scaler still apply it."""
+    X = features_list if isinstance(features_list, np.ndarray) else _feature_matrix(features_list)
+    return scaler.transform(X) if scaler is not None else X
+
+
+def _fit_forest(model, X_train: np.ndarray, y_train: np.ndarray, n_jobs: int = -1):
+    """Fit a forest with trees built on n_jobs cores (all by default). Prediction
+    stays single-threaded: per-request batches are too small for a thread pool to pay off."""
+    model.set_params(n_jobs=n_jobs)
+    try:
+        model.fit(X_train, y_train)
+    finally:
+        model.set_params(n_jobs=None)
+
+
+@functools.lru_cache(maxsize=8)
+def _load_bundle(path: str, mtime: float) -> Dict[str, Any]:
+    """Unpickle a saved model bundle once per file version.
+    The mtime is part of the key so a retrained model replaces the cached one.
+    Plain pickle on purpose: sklearn copies tree arrays out of the file while
+    unpickling, so joblib memory-mapping loads no faster and shares no pages."""
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
 
 class PerformancePredictor:
     """
@@ -25,32 +74,36 @@ class PerformancePredictor:
         self.model = RandomForestRegressor(
             n_estimators=100,
             max_depth=10,
+            max_features='sqrt',
             random_state=42
         )
-        self.scaler = StandardScaler()
+        # Only set for models loaded from files saved with a StandardScaler
+        self.scaler = None
         self.is_trained = False
-        self.feature_names = [
-            'avg_attendance', 'avg_assignment', 'avg_internal',
-            'avg_mood', 'avg_study_hours', 'avg_sleep_hours'
-        ]
+        self._feature_importance = None
+        self.feature_names = list(FEATURE_NAMES)
     
-    def train(self, X: np.ndarray, y: np.ndarray) -> Dict[str, float]:
+    def train(self, X: np.ndarray, y: np.ndarray, n_jobs: int = -1) -> Dict[str, float]:
         """Train the regression model"""
+        # Trees split on float32 internally; converting once avoids a copy per fit and predict
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        # Targets are the other way round: forests fit on float64 y and would
+        # upcast float32 targets again, losing precision in the metrics too
+        y = np.ascontiguousarray(y, dtype=np.float64)
+        
         # Split data
         X_train, X_test, y_train, y_test = train_test_split(
             X, y, test_size=0.2, random_state=42
         )
         
-        # Scale features
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
-        
         # Train model
-        self.model.fit(X_train_scaled, y_train)
+        _fit_forest(self.model, X_train, y_train, n_jobs)
+        self._feature_importance = None
+        self.scaler = None
         self.is_trained = True
         
         # Evaluate
-        y_pred = self.model.predict(X_test_scaled)
+        y_pred = self.model.predict(X_test)
         
         metrics = {
             'mse': float(mean_squared_error(y_test, y_pred)),
@@ -60,34 +113,32 @@ class PerformancePredictor:
         
         return metrics
     
-    def predict(self, features: Dict[str, float]) -> float:
-        """Predict final score for a student"""
+    def predict(self, features: Union[Dict[str, float], np.ndarray]) -> float:
+        """Predict final score for a student from a feature dict or a (1, n_features) row"""
+        return float(self.predict_batch(features if isinstance(features, np.ndarray) else [features])[0])
+    
+    def predict_batch(self, features_list: Union[List[Dict[str, float]], np.ndarray]) -> np.ndarray:
+        """Predict final scores for many students with a single model call.
+        Accepts feature dicts or a matrix with columns in FEATURE_NAMES order."""
         if not self.is_trained:
             raise ValueError("Model not trained yet!")
         
-        # Prepare features in correct order
-        X = np.array([[
-            features.get('avg_attendance', 0),
-            features.get('avg_assignment', 0),
-            features.get('avg_internal', 0),
-            features.get('avg_mood', 3),
-            features.get('avg_study_hours', 5),
-            features.get('avg_sleep_hours', 6)
-        ]])
-        
-        X_scaled = self.scaler.transform(X)
-        prediction = self.model.predict(X_scaled)[0]
-        
-        # Ensure prediction is within valid range
-        return float(max(0, min(100, prediction)))
+        predictions = self.model.predict(_model_input(features_list, self.scaler))
+        
+        # Ensure predictions are within valid range
+        return np.clip(predictions, 0, 100)
     
     def get_feature_importance(self) -> Dict[str, float]:
-        """Get feature importance from the model"""
+        """Get feature importance from the model.
+        Computed once per trained model; the shared dict must not be modified."""
         if not self.is_trained:
             return {}
         
-        importances = self.model.feature_importances_
-        return dict(zip(self.feature_names, importances.tolist()))
+        if self._feature_importance is None:
+            # feature_importances_ averages over every tree, so don't redo it per prediction
+            importances = self.model.feature_importances_
+            self._feature_importance = dict(zip(self.feature_names, importances.tolist()))
+        return self._feature_importance
     
     def save(self, filepath: str = None):
         """Save model to disk"""
@@ -97,7 +148,6 @@ class PerformancePredictor:
         with open(filepath, 'wb') as f:
             pickle.dump({
                 'model': self.model,
-                'scaler': self.scaler,
                 'is_trained': self.is_trained
             }, f)
     
@@ -107,11 +157,11 @@ class PerformancePredictor:
             filepath = MODEL_DIR / "performance_predictor.pkl"
         
         if Path(filepath).exists():
-            with open(filepath, 'rb') as f:
-                data = pickle.load(f)
-                self.model = data['model']
-                self.scaler = data['scaler']
-                self.is_trained = data['is_trained']
+            data = _load_bundle(str(filepath), Path(filepath).stat().st_mtime)
+            self.model = data['model']
+            self.scaler = data.get('scaler')
+            self.is_trained = data['is_trained']
+            self._feature_importance = None
 
 
 class RiskClassifier:
@@ -126,32 +176,33 @@ class RiskClassifier:
         self.model = RandomForestClassifier(
             n_estimators=100,
             max_depth=8,
+            max_features='sqrt',
             random_state=42
         )
-        self.scaler = StandardScaler()
+        # Only set for models loaded from files saved with a StandardScaler
+        self.scaler = None
         self.is_trained = False
-        self.feature_names = [
-            'avg_attendance', 'avg_assignment', 'avg_internal',
-            'avg_mood', 'avg_study_hours', 'avg_sleep_hours'
-        ]
+        self._feature_importance = None
+        self.feature_names = list(FEATURE_NAMES)
     
-    def train(self, X: np.ndarray, y: np.ndarray) -> Dict[str, Any]:
+    def train(self, X: np.ndarray, y: np.ndarray, n_jobs: int = -1) -> Dict[str, Any]:
         """Train the classification model"""
+        # Trees split on float32 internally; converting once avoids a copy per fit and predict
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        
         # Split data
         X_train, X_test, y_train, y_test = train_test_split(
             X, y, test_size=0.2, random_state=42, stratify=y
         )
         
-        # Scale features
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
-        
         # Train model
-        self.model.fit(X_train_scaled, y_train)
+        _fit_forest(self.model, X_train, y_train, n_jobs)
+        self._feature_importance = None
+        self.scaler = None
         self.is_trained = True
         
         # Evaluate
-        y_pred = self.model.predict(X_test_scaled)
+        y_pred = self.model.predict(X_test)
         
         metrics = {
             'accuracy': float(accuracy_score(y_test, y_pred)),
@@ -164,46 +215,50 @@ class RiskClassifier:
         
         return metrics
     
-    def predict(self, features: Dict[str, float]) -> Tuple[str, Dict[str, float]]:
+    def predict(self, features: Union[Dict[str, float], np.ndarray]) -> Tuple[str, Dict[str, float]]:
         """
-        Predict risk category for a student
+        Predict risk category for a student from a feature dict or a (1, n_features) row
         Returns: (risk_label, probability_dict)
         """
+        return self.predict_batch(features if isinstance(features, np.ndarray) else [features])[0]
+    
+    def predict_batch(self, features_list: Union[List[Dict[str, float]], np.ndarray]) -> List[Tuple[str, Dict[str, float]]]:
+        """Predict risk categories for many students with a single model call.
+        Accepts feature dicts or a matrix with columns in FEATURE_NAMES order.
+        Returns one (risk_label, probability_dict) per student."""
         if not self.is_trained:
             raise ValueError("Model not trained yet!")
         
-        # Prepare features in correct order
-        X = np.array([[
-            features.get('avg_attendance', 0),
-            features.get('avg_assignment', 0),
-            features.get('avg_internal', 0),
-            features.get('avg_mood', 3),
-            features.get('avg_study_hours', 5),
-            features.get('avg_sleep_hours', 6)
-        ]])
-        
-        X_scaled = self.scaler.transform(X)
-        
-        # Get prediction and probabilities
-        prediction = self.model.predict(X_scaled)[0]
-        probabilities = self.model.predict_proba(X_scaled)[0]
-        
-        risk_label = self.RISK_LABELS[prediction]
-        prob_dict = {
-            'Low': float(probabilities[0]),
-            'Medium': float(probabilities[1]),
-            'High': float(probabilities[2])
-        }
+        X = _model_input(features_list, self.scaler)
+        
+        # One pass over the forest: the predicted class is the most probable one,
+        # which is exactly what model.predict would compute with a second pass
+        probabilities = self.model.predict_proba(X)
+        predictions = self.model.classes_.take(probabilities.argmax(axis=1))
         
-        return risk_label, prob_dict
+        # Spread probabilities over all risk levels; a class missing from training has probability 0
+        full = np.zeros((len(probabilities), len(self.RISK_LABELS)))
+        full[:, self.model.classes_] = probabilities
+        
+        return [
+            (
+                self.RISK_LABELS[prediction],
+                {'Low': float(probs[0]), 'Medium': float(probs[1]), 'High': float(probs[2])}
+            )
+            for prediction, probs in zip(predictions.tolist(), full.tolist())
+        ]
     
     def get_feature_importance(self) -> Dict[str, float]:
-        """Get feature importance from the model"""
+        """Get feature importance from the model.
+        Computed once per trained model; the shared dict must not be modified."""
         if not self.is_trained:
             return {}
         
-        importances = self.model.feature_importances_
-        return dict(zip(self.feature_names, importances.tolist()))
+        if self._feature_importance is None:
+            # feature_importances_ averages over every tree, so don't redo it per prediction
+            importances = self.model.feature_importances_
+            self._feature_importance = dict(zip(self.feature_names, importances.tolist()))
+        return self._feature_importance
     
     def save(self, filepath: str = None):
         """Save model to disk"""
@@ -213,7 +268,6 @@ class RiskClassifier:
         with open(filepath, 'wb') as f:
             pickle.dump({
                 'model': self.model,
-                'scaler': self.scaler,
                 'is_trained': self.is_trained
             }, f)
     
@@ -223,8 +277,8 @@ class RiskClassifier:
             filepath = MODEL_DIR / "risk_classifier.pkl"
         
         if Path(filepath).exists():
-            with open(filepath, 'rb') as f:
-                data = pickle.load(f)
-                self.model = data['model']
-                self.scaler = data['scaler']
-                self.is_trained = data['is_trained']
+            data = _load_bundle(str(filepath), Path(filepath).stat().st_mtime)
+            self.model = data['model']
+            self.scaler = data.get('scaler')
+            self.is_trained = data['is_trained']
+            self._feature_importance = None
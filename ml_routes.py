@@ -2,19 +2,16 @@
 ML Routes
 API endpoints for machine learning operations
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from typing import List
-import sys
-from pathlib import Path
-sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from services import MLService
+from services import MLService, ModelNotTrainedError
+from dependencies import get_ml_service
 
 router = APIRouter(prefix="/ml", tags=["Machine Learning"])
 
-ml_service = MLService()
-
 
 class SentimentRequest(BaseModel):
     text: str
@@ -25,64 +22,66 @@ class BatchPredictionRequest(BaseModel):
 
 
 @router.post("/train")
-async def train_models():
+async def train_models(ml_service: MLService = Depends(get_ml_service)):
     """Train all ML models"""
     try:
         metrics = ml_service.train_models()
         
-        return {
+        return ORJSONResponse({
             "success": True,
             "message": "Models trained successfully",
             "data": metrics
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/status")
-async def get_model_status():
+async def get_model_status(ml_service: MLService = Depends(get_ml_service)):
     """Get status and info about trained models"""
     try:
         info = ml_service.get_model_info()
         
-        return {
+        return ORJSONResponse({
             "success": True,
             "data": info
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/sentiment")
-async def analyze_sentiment(request: SentimentRequest):
+async def analyze_sentiment(request: SentimentRequest, ml_service: MLService = Depends(get_ml_service)):
     """Analyze sentiment of given text"""
     try:
         result = ml_service.analyze_sentiment(request.text)
         
-        return {
+        return ORJSONResponse({
             "success": True,
             "data": result
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/batch-predict")
-async def batch_predictions(request: BatchPredictionRequest):
+async def batch_predictions(request: BatchPredictionRequest, ml_service: MLService = Depends(get_ml_service)):
     """Get predictions for multiple students"""
     try:
         results = ml_service.get_batch_predictions(request.student_ids)
         
-        return {
+        return ORJSONResponse({
             "success": True,
             "data": results
-        }
+        })
+    except ModelNotTrainedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/predict/{student_id}")
-async def predict_performance(student_id: str):
+async def predict_performance(student_id: str, ml_service: MLService = Depends(get_ml_service)):
     """Predict academic performance for a student"""
     try:
         prediction = ml_service.predict_performance(student_id)
@@ -90,18 +89,20 @@ async def predict_performance(student_id: str):
         if not prediction:
             raise HTTPException(status_code=404, detail="Student not found")
         
-        return {
+        return ORJSONResponse({
             "success": True,
             "data": prediction
-        }
+        })
     except HTTPException:
         raise
+    except ModelNotTrainedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/risk/{student_id}")
-async def classify_risk(student_id: str):
+async def classify_risk(student_id: str, ml_service: MLService = Depends(get_ml_service)):
     """Classify risk level for a student"""
     try:
         risk = ml_service.classify_risk(student_id)
@@ -109,11 +110,13 @@ async def classify_risk(student_id: str):
         if not risk:
             raise HTTPException(status_code=404, detail="Student not found")
         
-        return {
+        return ORJSONResponse({
             "success": True,
             "data": risk
-        }
+        })
     except HTTPException:
         raise
+    except ModelNotTrainedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -2,14 +2,54 @@
 ML Service
 Handles model training and predictions
 """
-import sys
-from pathlib import Path
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
-from preprocessing import prepare_training_data, prepare_features_for_prediction
-from models.ml_models import PerformancePredictor, RiskClassifier
+from preprocessing import (
+    prepare_training_data, prepare_features_for_prediction,
+    prepare_features_for_display, prepare_features_for_prediction_batch
+)
+from models.ml_models import PerformancePredictor, RiskClassifier, FEATURE_NAMES
 from models.sentiment_analyzer import SentimentAnalyzer
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple, List, Callable
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import TTLCache
+import bisect
+import os
+import pickle
+import threading
+import numpy as np
+
+# Score bands for the interpretation texts: a score at a threshold falls in the band above it
+_PREDICTION_THRESHOLDS = (40, 60, 80)
+_PREDICTION_INTERPRETATIONS = (
+    'Below average performance predicted. Immediate intervention recommended.',
+    'Average performance expected. Additional effort and support recommended.',
+    'Good performance expected. Consider focusing on weaker areas.',
+    'Excellent performance expected. Keep up the great work!'
+)
+
+_RISK_INTERPRETATIONS = {
+    'High': 'High risk detected with {:.1%} confidence. Immediate attention required.',
+    'Medium': 'Medium risk detected with {:.1%} confidence. Monitor progress closely.',
+    'Low': 'Low risk with {:.1%} confidence. Student is performing well.'
+}
+
+# Mental health score bands: a score at a threshold falls in the band below it
+_MENTAL_HEALTH_THRESHOLDS = (3, 5, 7)
+_MENTAL_HEALTH_LABELS = (
+    'Concerning - Seek support',
+    'Fair - Monitor closely',
+    'Good - Maintain balance',
+    'Excellent - Keep it up'
+)
+
+# Model outputs per feature row. Features only change when a student adds
+# data, so repeated dashboard requests reuse the forest's answer; the TTL
+# bounds how long rows of students who changed stay around.
+PREDICTION_CACHE_SIZE = 10_000
+PREDICTION_CACHE_TTL = 300
+
+
+class ModelNotTrainedError(RuntimeError):
+    """Raised when a prediction is requested before the models are trained"""
 
 
 class MLService:
@@ -22,20 +62,29 @@ class MLService:
         self.risk_classifier = RiskClassifier()
         self.sentiment_analyzer = SentimentAnalyzer()
         self.training_metrics = {}
+        self._score_cache = TTLCache(maxsize=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL)
+        self._risk_cache = TTLCache(maxsize=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL)
+        self._prediction_cache_lock = threading.Lock()
+        # Reuse models saved by an earlier run instead of retraining on the first prediction
+        self.load_models()
     
     def train_models(self) -> Dict[str, Any]:
         """Train all ML models and return metrics"""
         X, y_reg, y_clf = prepare_training_data()
         
-        # Train performance predictor
-        reg_metrics = self.performance_predictor.train(X, y_reg)
-        
-        # Train risk classifier
-        clf_metrics = self.risk_classifier.train(X, y_clf)
+        # Train both models at once; tree fitting releases the GIL, so threads
+        # overlap. Each forest gets half the cores so they don't oversubscribe.
+        n_jobs = max(1, (os.cpu_count() or 1) // 2)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            reg_future = executor.submit(self.performance_predictor.train, X, y_reg, n_jobs)
+            clf_future = executor.submit(self.risk_classifier.train, X, y_clf, n_jobs)
+            reg_metrics = reg_future.result()
+            clf_metrics = clf_future.result()
         
         # Save models
         self.performance_predictor.save()
         self.risk_classifier.save()
+        self._clear_prediction_caches()
         
         self.training_metrics = {
             'performance_predictor': reg_metrics,
@@ -46,24 +95,85 @@ class MLService:
         return self.training_metrics
     
     def load_models(self) -> bool:
-        """Load pre-trained models from disk"""
+        """Load pre-trained models from disk; returns whether both are trained"""
         try:
             self.performance_predictor.load()
             self.risk_classifier.load()
-            return True
-        except:
+            self._clear_prediction_caches()
+        except (OSError, EOFError, KeyError, pickle.UnpicklingError) as e:
+            print(f"⚠️ Could not load saved models: {e}")
             return False
+        return self.is_trained
+    
+    @property
+    def is_trained(self) -> bool:
+        return self.performance_predictor.is_trained and self.risk_classifier.is_trained
+    
+    def _require_trained(self):
+        # Training takes far too long to run inside a request; it happens at
+        # startup or through /ml/train
+        if not self.is_trained:
+            raise ModelNotTrainedError("Models are not trained yet")
     
     def predict_performance(self, student_id: str) -> Optional[Dict[str, Any]]:
         """Predict academic performance for a student"""
-        if not self.performance_predictor.is_trained:
-            self.train_models()
+        self._require_trained()
+        
+        X = prepare_features_for_prediction(student_id)
+        if X is None:
+            return None
+        
+        # The model reads the row; the response shows the same features by name
+        return self._performance_result(student_id, X, prepare_features_for_display(student_id))
+    
+    def classify_risk(self, student_id: str) -> Optional[Dict[str, Any]]:
+        """Classify risk level for a student"""
+        self._require_trained()
         
-        features = prepare_features_for_prediction(student_id)
-        if not features:
+        X = prepare_features_for_prediction(student_id)
+        if X is None:
             return None
         
-        predicted_score = self.performance_predictor.predict(features)
+        return self._risk_result(student_id, X, prepare_features_for_display(student_id))
+    
+    def predict_from_features(self, student_id: str, features: Dict[str, float]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Performance prediction and risk classification for features the caller
+        already has, without reading them from the database"""
+        self._require_trained()
+        
+        X = np.array([[features[name] for name in FEATURE_NAMES]], dtype=np.float32)
+        return self._performance_result(student_id, X, features), self._risk_result(student_id, X, features)
+    
+    def _clear_prediction_caches(self):
+        with self._prediction_cache_lock:
+            self._score_cache.clear()
+            self._risk_cache.clear()
+    
+    def _cached_predictions(self, cache: TTLCache, X: np.ndarray, predict_batch: Callable[[np.ndarray], list]) -> list:
+        """Model outputs for each row of X, running the model only on rows not in cache.
+        Cached outputs are shared and must not be modified."""
+        keys = [row.tobytes() for row in X]
+        with self._prediction_cache_lock:
+            results = [cache.get(key) for key in keys]
+        
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            computed = predict_batch(X[missing])
+            with self._prediction_cache_lock:
+                for i, result in zip(missing, computed):
+                    results[i] = cache[keys[i]] = result
+        return results
+    
+    def _predict_scores(self, X: np.ndarray) -> List[float]:
+        return self._cached_predictions(
+            self._score_cache, X, lambda rows: self.performance_predictor.predict_batch(rows).tolist()
+        )
+    
+    def _predict_risks(self, X: np.ndarray) -> List[Tuple[str, Dict[str, float]]]:
+        return self._cached_predictions(self._risk_cache, X, self.risk_classifier.predict_batch)
+    
+    def _performance_result(self, student_id: str, X: np.ndarray, features: Dict[str, float]) -> Dict[str, Any]:
+        predicted_score = self._predict_scores(X)[0]
         feature_importance = self.performance_predictor.get_feature_importance()
         
         return {
@@ -74,16 +184,8 @@ class MLService:
             'interpretation': self._interpret_prediction(predicted_score)
         }
     
-    def classify_risk(self, student_id: str) -> Optional[Dict[str, Any]]:
-        """Classify risk level for a student"""
-        if not self.risk_classifier.is_trained:
-            self.train_models()
-        
-        features = prepare_features_for_prediction(student_id)
-        if not features:
-            return None
-        
-        risk_label, probabilities = self.risk_classifier.predict(features)
+    def _risk_result(self, student_id: str, X: np.ndarray, features: Dict[str, float]) -> Dict[str, Any]:
+        risk_label, probabilities = self._predict_risks(X)[0]
         feature_importance = self.risk_classifier.get_feature_importance()
         
         return {
@@ -108,19 +210,21 @@ class MLService:
     
     def get_batch_predictions(self, student_ids: list) -> Dict[str, Any]:
         """Get predictions for multiple students"""
-        if not self.performance_predictor.is_trained:
-            self.train_models()
+        self._require_trained()
+        
+        # One query for every student's features, then one call per model
+        found_ids, X = prepare_features_for_prediction_batch(student_ids)
         
         results = []
-        for sid in student_ids:
-            perf = self.predict_performance(sid)
-            risk = self.classify_risk(sid)
-            if perf and risk:
+        if found_ids:
+            scores = self._predict_scores(X)
+            risks = self._predict_risks(X)
+            for sid, score, (risk_label, probabilities) in zip(found_ids, scores, risks):
                 results.append({
                     'student_id': sid,
-                    'predicted_score': perf['predicted_final_score'],
-                    'risk_level': risk['risk_level'],
-                    'risk_probabilities': risk['probabilities']
+                    'predicted_score': round(score, 2),
+                    'risk_level': risk_label,
+                    'risk_probabilities': probabilities
                 })
         
         return {
@@ -146,33 +250,14 @@ class MLService:
     
     def _interpret_prediction(self, score: float) -> str:
         """Interpret predicted score"""
-        if score >= 80:
-            return 'Excellent performance expected. Keep up the great work!'
-        elif score >= 60:
-            return 'Good performance expected. Consider focusing on weaker areas.'
-        elif score >= 40:
-            return 'Average performance expected. Additional effort and support recommended.'
-        else:
-            return 'Below average performance predicted. Immediate intervention recommended.'
+        return _PREDICTION_INTERPRETATIONS[bisect.bisect_right(_PREDICTION_THRESHOLDS, score)]
     
     def _interpret_risk(self, label: str, probs: Dict[str, float]) -> str:
         """Interpret risk classification"""
         confidence = max(probs.values())
         
-        if label == 'High':
-            return f'High risk detected with {confidence:.1%} confidence. Immediate attention required.'
-        elif label == 'Medium':
-            return f'Medium risk detected with {confidence:.1%} confidence. Monitor progress closely.'
-        else:
-            return f'Low risk with {confidence:.1%} confidence. Student is performing well.'
+        return _RISK_INTERPRETATIONS.get(label, _RISK_INTERPRETATIONS['Low']).format(confidence)
     
     def _get_mental_health_label(self, score: int) -> str:
         """Convert mental health score to label"""
-        if score <= 3:
-            return 'Concerning - Seek support'
-        elif score <= 5:
-            return 'Fair - Monitor closely'
-        elif score <= 7:
-            return 'Good - Maintain balance'
-        else:
-            return 'Excellent - Keep it up'
+        return _MENTAL_HEALTH_LABELS[bisect.bisect_left(_MENTAL_HEALTH_THRESHOLDS, score)]
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr
 from typing import Optional, List
 from datetime import datetime
 from models.sql_models import UserRole, CounselingRequestStatus
@@ -18,8 +18,7 @@ class UserLogin(BaseModel):
 
 class UserResponse(UserBase):
     id: int
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class Token(BaseModel):
     access_token: str
@@ -27,6 +26,10 @@ class Token(BaseModel):
     role: str
     user_id: int
     name: str
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     email: Optional[str] = None
@@ -47,8 +50,7 @@ class StudentAcademicDataResponse(StudentAcademicDataBase):
     predicted_performance: Optional[float]
     risk_level: Optional[str]
     timestamp: datetime
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Behavior Data Schemas (Questionnaire)
 class QuestionnaireInput(BaseModel):
@@ -69,8 +71,7 @@ class StudentBehaviorDataResponse(BaseModel):
     study_hours: float
     sentiment_result: Optional[str]
     timestamp: datetime
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Counselor Schemas
 class CounselorRemarkCreate(BaseModel):
@@ -83,8 +84,7 @@ class CounselorRemarkResponse(BaseModel):
     counselor_id: int
     remarks: str
     timestamp: datetime
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Counseling Request Schemas
 class CounselingRequestCreate(BaseModel):
@@ -99,8 +99,7 @@ class CounselingRequestResponse(BaseModel):
     counselor_id: Optional[int]
     status: str
     request_time: datetime
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Chat Schemas
 class ChatMessageCreate(BaseModel):
@@ -113,5 +112,4 @@ class ChatMessageResponse(BaseModel):
     receiver_id: int
     message: str
     timestamp: datetime
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
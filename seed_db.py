@@ -8,6 +8,7 @@ from sqlalchemy.orm import Session
 from database import SessionLocal, engine, Base
 from models.sql_models import User, UserRole, StudentAcademicData, StudentBehaviorData
 from services.auth_service import AuthService
+from concurrent.futures import ThreadPoolExecutor
 import datetime
 
 # Create tables
@@ -29,22 +30,27 @@ def seed():
         {"name": "John Doe", "email": "john@test.com", "password": "password123", "role": UserRole.STUDENT},
     ]
 
-    db_users = []
-    for u in users:
-        new_user = User(
+    # bcrypt releases the GIL, so the deliberately slow hashes run side by side
+    with ThreadPoolExecutor(max_workers=len(users)) as executor:
+        hashes = list(executor.map(AuthService.get_password_hash, [u["password"] for u in users]))
+
+    db_users = [
+        User(
             name=u["name"],
             email=u["email"],
-            hashed_password=AuthService.get_password_hash(u["password"]),
+            hashed_password=hashed_password,
             role=u["role"]
         )
-        db.add(new_user)
-        db_users.append(new_user)
-    
-    db.commit()
+        for u, hashed_password in zip(users, hashes)
+    ]
+    db.add_all(db_users)
+    # Flush assigns the user ids; everything is committed together below
+    db.flush()
     
     # Add some initial data for students
     student_ids = [u.id for u in db_users if u.role == UserRole.STUDENT]
     
+    entries = []
     for sid in student_ids:
         # Academic Data
         ac = StudentAcademicData(
@@ -55,7 +61,7 @@ def seed():
             predicted_performance=78.5,
             risk_level="Low"
         )
-        db.add(ac)
+        entries.append(ac)
         
         # Behavior Data
         bh = StudentBehaviorData(
@@ -65,8 +71,9 @@ def seed():
             study_hours=5.0,
             sentiment_result="Positive"
         )
-        db.add(bh)
+        entries.append(bh)
     
+    db.add_all(entries)
     db.commit()
     print("Database seeded successfully!")
     db.close()
@@ -2,10 +2,27 @@
 NLP Sentiment Analysis Module
 Analyzes student text feedback to detect emotional state
 """
-from textblob import TextBlob
-from typing import Dict, Any, List
+from textblob.en.sentiments import PatternAnalyzer
+import numpy as np
+from typing import Dict, Any, List, Tuple
+from cachetools import LRUCache
+import hashlib
+import threading
 import re
 
+# Most recent analyses kept per analyzer; repeated feedback texts skip TextBlob
+ANALYSIS_CACHE_SIZE = 4096
+
+# TextBlob's default sentiment analyzer, called directly to skip building a
+# TextBlob per text. Same lexicon, so polarity and subjectivity are unchanged.
+_PATTERN_ANALYZER = PatternAnalyzer()
+
+# Characters dropped when cleaning text, applied after lowercasing
+_SPECIAL_CHARS = re.compile(r'[^a-z0-9\s.,!?]')
+
+# Words of the cleaned text, matched against the keyword sets
+_WORD = re.compile(r"[a-z']+")
+
 
 class SentimentAnalyzer:
     """
@@ -30,8 +47,14 @@ class SentimentAnalyzer:
         'successful', 'achieved', 'grateful', 'positive', 'engaged'
     ]
     
+    # Keyword lookups are one set intersection with the text's words
+    STRESS_SET = frozenset(STRESS_KEYWORDS)
+    POSITIVE_SET = frozenset(POSITIVE_KEYWORDS)
+    
     def __init__(self):
-        self.analysis_cache = {}
+        # Bounded LRU so a long-running worker can't grow it forever
+        self.analysis_cache = LRUCache(maxsize=ANALYSIS_CACHE_SIZE)
+        self._analysis_cache_lock = threading.Lock()
     
     def analyze(self, text: str) -> Dict[str, Any]:
         """
@@ -48,60 +71,67 @@ class SentimentAnalyzer:
                 'confidence': 0.5
             }
         
-        # Check cache
-        cache_key = hash(text)
-        if cache_key in self.analysis_cache:
-            return self.analysis_cache[cache_key]
+        sentiment, polarity, subjectivity, stress_found, positive_found, confidence = self._analyze_cached(text)
         
+        # A fresh dict per call, so callers can't modify the cached analysis
+        return {
+            'sentiment': sentiment,
+            'polarity': polarity,
+            'subjectivity': subjectivity,
+            'stress_indicators': list(stress_found),
+            'positive_indicators': list(positive_found),
+            'confidence': confidence
+        }
+    
+    def _analyze_cached(self, text: str) -> Tuple[str, float, float, Tuple[str, ...], Tuple[str, ...], float]:
+        """Analysis result from the cache, keyed by a blake2b digest of the text.
+        Unlike hash(), the digest is the same in every process, and the cache
+        holds 16 bytes per entry instead of the whole text."""
+        cache_key = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+        with self._analysis_cache_lock:
+            result = self.analysis_cache.get(cache_key)
+        if result is None:
+            result = self._analyze_uncached(text)
+            with self._analysis_cache_lock:
+                self.analysis_cache[cache_key] = result
+        return result
+    
+    def _analyze_uncached(self, text: str) -> Tuple[str, float, float, Tuple[str, ...], Tuple[str, ...], float]:
+        """Run the analysis; returns an immutable tuple so it can be cached"""
         # Clean text
         cleaned_text = self._clean_text(text)
         
-        # TextBlob analysis
-        blob = TextBlob(cleaned_text)
-        polarity = blob.sentiment.polarity  # -1 to 1
-        subjectivity = blob.sentiment.subjectivity  # 0 to 1
+        # TextBlob (pattern) analysis
+        polarity, subjectivity = _PATTERN_ANALYZER.analyze(cleaned_text)  # -1 to 1, 0 to 1
         
-        # Find stress and positive indicators
-        stress_found = self._find_keywords(cleaned_text, self.STRESS_KEYWORDS)
-        positive_found = self._find_keywords(cleaned_text, self.POSITIVE_KEYWORDS)
+        # Find stress and positive indicators; whole words only, so 'hard' doesn't match 'hardly'.
+        # Sorted so the indicator order doesn't depend on set iteration order.
+        tokens = set(_WORD.findall(cleaned_text))
+        stress_found = sorted(tokens & self.STRESS_SET)
+        positive_found = sorted(tokens & self.POSITIVE_SET)
         
         # Determine sentiment with keyword boosting
         sentiment, confidence = self._determine_sentiment(
             polarity, stress_found, positive_found
         )
         
-        result = {
-            'sentiment': sentiment,
-            'polarity': round(polarity, 3),
-            'subjectivity': round(subjectivity, 3),
-            'stress_indicators': stress_found,
-            'positive_indicators': positive_found,
-            'confidence': round(confidence, 3)
-        }
-        
-        # Cache result
-        self.analysis_cache[cache_key] = result
-        
-        return result
+        return (
+            sentiment,
+            round(polarity, 3),
+            round(subjectivity, 3),
+            tuple(stress_found),
+            tuple(positive_found),
+            round(confidence, 3)
+        )
     
     def _clean_text(self, text: str) -> str:
         """Clean and preprocess text"""
-        # Convert to lowercase
-        text = text.lower()
-        # Remove special characters but keep spaces and basic punctuation
-        text = re.sub(r'[^a-zA-Z0-9\s.,!?]', '', text)
+        # Lowercase, then remove special characters but keep spaces and basic punctuation
+        text = _SPECIAL_CHARS.sub('', text.lower())
         # Remove extra whitespace
         text = ' '.join(text.split())
         return text
     
-    def _find_keywords(self, text: str, keywords: List[str]) -> List[str]:
-        """Find matching keywords in text"""
-        found = []
-        for keyword in keywords:
-            if keyword in text:
-                found.append(keyword)
-        return found
-    
     def _determine_sentiment(
         self, 
         polarity: float, 
@@ -147,28 +177,22 @@ class SentimentAnalyzer:
         """
         results = [self.analyze(text) for text in texts]
         
-        positive_count = sum(1 for r in results if r['sentiment'] == 'Positive')
-        neutral_count = sum(1 for r in results if r['sentiment'] == 'Neutral')
-        negative_count = sum(1 for r in results if r['sentiment'] == 'Negative')
-        
-        avg_polarity = sum(r['polarity'] for r in results) / len(results) if results else 0
+        # Aggregate in numpy rather than one Python pass per statistic
+        polarities = np.fromiter((r['polarity'] for r in results), dtype=np.float64, count=len(results))
+        labels, counts = np.unique([r['sentiment'] for r in results], return_counts=True)
+        label_counts = dict(zip(labels.tolist(), counts.tolist()))
         
-        all_stress = []
-        all_positive = []
-        for r in results:
-            all_stress.extend(r['stress_indicators'])
-            all_positive.extend(r['positive_indicators'])
+        avg_polarity = float(polarities.mean()) if results else 0
         
         return {
             'total_analyzed': len(results),
             'sentiment_distribution': {
-                'Positive': positive_count,
-                'Neutral': neutral_count,
-                'Negative': negative_count
+                label: label_counts.get(label, 0)
+                for label in ('Positive', 'Neutral', 'Negative')
             },
             'average_polarity': round(avg_polarity, 3),
-            'common_stress_indicators': list(set(all_stress)),
-            'common_positive_indicators': list(set(all_positive)),
+            'common_stress_indicators': list(set().union(*(r['stress_indicators'] for r in results))),
+            'common_positive_indicators': list(set().union(*(r['positive_indicators'] for r in results))),
             'individual_results': results
         }
     
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Enum, Text
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Enum, Text, Index
 from sqlalchemy.orm import relationship
 from database import Base
 import datetime
@@ -9,14 +9,19 @@ class UserRole(str, enum.Enum):
     TEACHER = "teacher"
     COUNSELOR = "counselor"
 
+def _enum_values(enum_class):
+    """Store enum values ("student"), not member names, matching existing rows"""
+    return [member.value for member in enum_class]
+
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     name = Column(String, index=True)
     email = Column(String, unique=True, index=True)
     hashed_password = Column(String)
-    role = Column(String, default=UserRole.STUDENT)
+    # Loaded as UserRole members; indexed for the role filters on student lists
+    role = Column(Enum(UserRole, values_callable=_enum_values, native_enum=False), default=UserRole.STUDENT, index=True)
 
     academic_data = relationship("StudentAcademicData", back_populates="student", cascade="all, delete-orphan")
     behavior_data = relationship("StudentBehaviorData", back_populates="student", cascade="all, delete-orphan")
@@ -25,8 +30,10 @@ class User(Base):
 
 class StudentAcademicData(Base):
     __tablename__ = "student_academic_data"
+    # A student's rows in time order: latest-entry lookups become an index seek
+    __table_args__ = (Index("ix_academic_student_ts", "student_id", "timestamp"),)
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     student_id = Column(Integer, ForeignKey("users.id"))
     marks = Column(Float)
     attendance = Column(Float)
@@ -39,8 +46,9 @@ class StudentAcademicData(Base):
 
 class StudentBehaviorData(Base):
     __tablename__ = "student_behavior_data"
+    __table_args__ = (Index("ix_behavior_student_ts", "student_id", "timestamp"),)
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     student_id = Column(Integer, ForeignKey("users.id"))
     mood_score = Column(Integer) # 1-5
     sleep_hours = Column(Float)
@@ -53,16 +61,18 @@ class StudentBehaviorData(Base):
 class CounselorRemark(Base):
     __tablename__ = "counselor_remarks"
 
-    id = Column(Integer, primary_key=True, index=True)
-    student_id = Column(Integer, ForeignKey("users.id"))
+    id = Column(Integer, primary_key=True)
+    student_id = Column(Integer, ForeignKey("users.id"), index=True)
     counselor_id = Column(Integer, ForeignKey("users.id"))
     remarks = Column(Text)
     timestamp = Column(DateTime, default=datetime.datetime.utcnow)
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    # Serves both directions of the conversation lookup, newest first
+    __table_args__ = (Index("ix_chat_pair_ts", "sender_id", "receiver_id", "timestamp"),)
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     sender_id = Column(Integer, ForeignKey("users.id"))
     receiver_id = Column(Integer, ForeignKey("users.id"))
     message = Column(Text)
@@ -76,10 +86,10 @@ class CounselingRequestStatus(str, enum.Enum):
 class CounselingRequest(Base):
     __tablename__ = "counseling_requests"
 
-    id = Column(Integer, primary_key=True, index=True)
-    student_id = Column(Integer, ForeignKey("users.id"))
-    counselor_id = Column(Integer, ForeignKey("users.id"), nullable=True)
-    status = Column(String, default=CounselingRequestStatus.PENDING)
+    id = Column(Integer, primary_key=True)
+    student_id = Column(Integer, ForeignKey("users.id"), index=True)
+    counselor_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    status = Column(Enum(CounselingRequestStatus, values_callable=_enum_values, native_enum=False), default=CounselingRequestStatus.PENDING)
     request_time = Column(DateTime, default=datetime.datetime.utcnow)
 
     student = relationship("User", back_populates="counseling_requests", foreign_keys=[student_id])
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 from database import get_db
 from models.sql_models import User, UserRole, StudentAcademicData, StudentBehaviorData
 from schemas import QuestionnaireInput, UserResponse
 from routes.auth_routes import get_current_user, check_role
 from services.student_service import StudentService
+from services import AnalyticsService, MLService
+from dependencies import get_analytics_service, get_ml_service
 from typing import List
 
 router = APIRouter(prefix="/students", tags=["Students"])
@@ -13,22 +16,24 @@ router = APIRouter(prefix="/students", tags=["Students"])
 def submit_questionnaire(
     data: QuestionnaireInput, 
     db: Session = Depends(get_db), 
-    current_user: User = Depends(check_role([UserRole.STUDENT]))
+    current_user: User = Depends(check_role([UserRole.STUDENT])),
+    ml_service: MLService = Depends(get_ml_service)
 ):
-    student_service = StudentService(db)
+    student_service = StudentService(db, ml_service=ml_service)
     result = student_service.process_questionnaire(current_user.id, data)
-    return {"success": True, "data": result}
+    return ORJSONResponse({"success": True, "data": result})
 
 @router.get("/dashboard", response_model=dict)
 def get_my_dashboard(
     db: Session = Depends(get_db), 
-    current_user: User = Depends(check_role([UserRole.STUDENT]))
+    current_user: User = Depends(check_role([UserRole.STUDENT])),
+    analytics_service: AnalyticsService = Depends(get_analytics_service)
 ):
-    student_service = StudentService(db)
+    student_service = StudentService(db, analytics_service=analytics_service)
     data = student_service.get_student_dashboard_data(current_user.id)
     if not data:
         raise HTTPException(status_code=404, detail="Student data not found")
-    return {"success": True, "data": data}
+    return ORJSONResponse({"success": True, "data": data})
 
 @router.get("/all", response_model=List[UserResponse])
 def get_students_list(
@@ -37,14 +42,24 @@ def get_students_list(
 ):
     return db.query(User).filter(User.role == UserRole.STUDENT).all()
 
+@router.get("/all-with-summary", response_model=dict)
+def get_students_with_summary(
+    db: Session = Depends(get_db), 
+    current_user: User = Depends(check_role([UserRole.TEACHER, UserRole.COUNSELOR]))
+):
+    student_service = StudentService(db)
+    students = student_service.get_students_with_summary()
+    return ORJSONResponse({"success": True, "data": students, "count": len(students)})
+
 @router.get("/{student_id}/dashboard", response_model=dict)
 def get_any_student_dashboard(
     student_id: int, 
     db: Session = Depends(get_db), 
-    current_user: User = Depends(check_role([UserRole.TEACHER, UserRole.COUNSELOR]))
+    current_user: User = Depends(check_role([UserRole.TEACHER, UserRole.COUNSELOR])),
+    analytics_service: AnalyticsService = Depends(get_analytics_service)
 ):
-    student_service = StudentService(db)
+    student_service = StudentService(db, analytics_service=analytics_service)
     data = student_service.get_student_dashboard_data(student_id)
     if not data:
         raise HTTPException(status_code=404, detail="Student not found")
-    return {"success": True, "data": data}
+    return ORJSONResponse({"success": True, "data": data})
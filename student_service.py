@@ -1,15 +1,65 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select, bindparam
+from sqlalchemy.orm import Session, aliased
 from models.sql_models import User, StudentAcademicData, StudentBehaviorData, UserRole
 from schemas import QuestionnaireInput
 from services.ml_service import MLService
+from preprocessing import invalidate_data_cache, invalidate_student_features, prepare_features_for_display
 from typing import Dict, Any
 
+
+def _latest_entry_id(model):
+    """Id of the student's most recent row in model, correlated to the outer User"""
+    entry = aliased(model)
+    return (
+        select(entry.id)
+        .where(entry.student_id == User.id)
+        .order_by(entry.timestamp.desc())
+        .limit(1)
+        .correlate(User)
+        .scalar_subquery()
+    )
+
+# Entry columns the read-only views show, selected as plain columns so rows
+# come back without building and tracking ORM instances
+_ACADEMIC_FIELDS = ('marks', 'attendance', 'assignment_scores', 'predicted_performance', 'risk_level', 'timestamp')
+_BEHAVIOR_FIELDS = ('mood_score', 'sleep_hours', 'study_hours', 'sentiment_result', 'timestamp')
+
+def _entry_columns(model, prefix: str, fields):
+    return [getattr(model, name).label(f'{prefix}_{name}') for name in ('id', *fields)]
+
+def _latest_entry(row, prefix: str, fields):
+    """The entry's fields from a result row, or None when the student has no entry"""
+    if row[f'{prefix}_id'] is None:
+        return None
+    return {name: row[f'{prefix}_{name}'] for name in fields}
+
+# Users with their latest academic and behavior entries in one round trip;
+# either entry's columns are NULL when the student has no data yet
+_LATEST_ENTRIES_STMT = (
+    select(
+        User.id, User.name, User.email, User.role,
+        *_entry_columns(StudentAcademicData, 'academic', _ACADEMIC_FIELDS),
+        *_entry_columns(StudentBehaviorData, 'behavior', _BEHAVIOR_FIELDS)
+    )
+    .select_from(User)
+    .outerjoin(StudentAcademicData, StudentAcademicData.id == _latest_entry_id(StudentAcademicData))
+    .outerjoin(StudentBehaviorData, StudentBehaviorData.id == _latest_entry_id(StudentBehaviorData))
+)
+_DASHBOARD_STMT = _LATEST_ENTRIES_STMT.where(User.id == bindparam('student_id'))
+_STUDENT_SUMMARIES_STMT = _LATEST_ENTRIES_STMT.where(User.role == UserRole.STUDENT).order_by(User.id)
+
 class StudentService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, ml_service: MLService = None, analytics_service=None):
         self.db = db
-        self.ml_service = MLService()
+        # Routes pass the app-wide instances; a new MLService reloads the models,
+        # so one is only built as a fallback by the method that needs it
+        self.ml_service = ml_service
+        self.analytics_service = analytics_service
 
     def process_questionnaire(self, student_id: int, data: QuestionnaireInput):
+        if self.ml_service is None:
+            self.ml_service = MLService()
+        
         # 1. Map indirect questions to mood score (1-5)
         # Concentration (1-5), Confidence (1-5), Fatigue (1-5, inverted)
         # Invert fatigue: 1 -> 5, 2 -> 4, 3 -> 3, 4 -> 2, 5 -> 1
@@ -19,16 +69,22 @@ class StudentService:
         final_mood_score = round(avg_mood_score)
         
         # 2. Store Behavior Data
-        sentiment_result = self.ml_service.analyze_sentiment(f"Concentration: {data.concentration_level}, Confidence: {data.confidence_level}, Fatigue: {data.mental_fatigue}")
+        # The answers are numeric, so the sentiment follows from the mood score
+        # rather than from running text analysis on a generated sentence
+        if final_mood_score >= 4:
+            sentiment_result = 'Positive'
+        elif final_mood_score <= 2:
+            sentiment_result = 'Negative'
+        else:
+            sentiment_result = 'Neutral'
         
         behavior_entry = StudentBehaviorData(
             student_id=student_id,
             mood_score=final_mood_score,
             sleep_hours=data.sleep_hours,
             study_hours=data.study_hours,
-            sentiment_result=sentiment_result['label']
+            sentiment_result=sentiment_result
         )
-        self.db.add(behavior_entry)
         
         # 3. Store Academic Data
         # For prediction, we need to calculate it now or let a background task do it
@@ -40,14 +96,18 @@ class StudentService:
             attendance=data.attendance,
             assignment_scores=data.assignment_scores
         )
-        self.db.add(academic_entry)
-        self.db.commit()
-        self.db.refresh(academic_entry)
+        self.db.add_all([behavior_entry, academic_entry])
+        # Flush so the new entries count towards the features below; the
+        # predictions are stored with them in a single commit
+        self.db.flush()
         
         # 4. Trigger ML Prediction and update the academic entry
-        # In a real app, you'd fetch all historical data for this student
-        prediction = self.ml_service.predict_performance(str(student_id))
-        risk = self.ml_service.classify_risk(str(student_id))
+        # Features come from this session, which sees the uncommitted entries
+        features = prepare_features_for_display(student_id, db=self.db, use_cache=False)
+        prediction, risk = None, None
+        # Without trained models the entries are stored without predictions
+        if features and self.ml_service.is_trained:
+            prediction, risk = self.ml_service.predict_from_features(str(student_id), features)
         
         if prediction:
             academic_entry.predicted_performance = prediction['predicted_final_score']
@@ -55,6 +115,8 @@ class StudentService:
             academic_entry.risk_level = risk['risk_level']
             
         self.db.commit()
+        invalidate_data_cache()
+        invalidate_student_features(student_id)
         
         return {
             "mood_score": final_mood_score,
@@ -62,48 +124,63 @@ class StudentService:
             "risk": risk
         }
 
+    def get_students_with_summary(self):
+        """Every student with their latest academic and behavior entry, from a
+        single query, so list views don't need a dashboard request per student"""
+        rows = self.db.execute(_STUDENT_SUMMARIES_STMT).mappings().all()
+        
+        return [
+            {
+                "student_id": row['id'],
+                "name": row['name'],
+                "email": row['email'],
+                "latest_academic": _latest_entry(row, 'academic', _ACADEMIC_FIELDS),
+                "latest_behavior": _latest_entry(row, 'behavior', _BEHAVIOR_FIELDS)
+            }
+            for row in rows
+        ]
+
     def get_student_dashboard_data(self, student_id: int):
         from services.analytics_service import AnalyticsService
         
-        user = self.db.query(User).filter(User.id == student_id).first()
-        if not user:
+        row = self.db.execute(_DASHBOARD_STMT, {'student_id': student_id}).mappings().first()
+        if not row:
             return None
-            
-        academic = self.db.query(StudentAcademicData).filter(StudentAcademicData.student_id == student_id).order_by(StudentAcademicData.timestamp.desc()).first()
-        behavior = self.db.query(StudentBehaviorData).filter(StudentBehaviorData.student_id == student_id).order_by(StudentBehaviorData.timestamp.desc()).first()
+        academic = _latest_entry(row, 'academic', _ACADEMIC_FIELDS)
+        behavior = _latest_entry(row, 'behavior', _BEHAVIOR_FIELDS)
         
         # Use AnalyticsService for rich data
-        analytics_service = AnalyticsService()
+        analytics_service = self.analytics_service or AnalyticsService()
         performance_trends = analytics_service.get_student_performance_trends(student_id)
         recommendations = analytics_service.generate_recommendations(student_id)
         
         # Construct response
         response = {
             "student_info": {
-                "student_id": user.id,
-                "name": user.name,
-                "email": user.email,
-                "role": user.role,
+                "student_id": row['id'],
+                "name": row['name'],
+                "email": row['email'],
+                "role": row['role'],
                 "department": "Computer Science", # Placeholder
                 "year": 3 # Placeholder
             },
             "performance": performance_trends if performance_trends else {
                 "summary": {
-                    "avg_marks": academic.marks if academic else 0,
-                    "avg_attendance": academic.attendance if academic else 0,
-                    "avg_mood": behavior.mood_score if behavior else 3,
-                    "avg_sleep_hours": behavior.sleep_hours if behavior else 7,
-                    "avg_study_hours": behavior.study_hours if behavior else 4
+                    "avg_marks": academic['marks'] if academic else 0,
+                    "avg_attendance": academic['attendance'] if academic else 0,
+                    "avg_mood": behavior['mood_score'] if behavior else 3,
+                    "avg_sleep_hours": behavior['sleep_hours'] if behavior else 7,
+                    "avg_study_hours": behavior['study_hours'] if behavior else 4
                 },
                 "subjects": [], # Would need subject-wise data
                 "mental_trends": [] # Would need historical data
             },
             "prediction": {
-                "predicted_final_score": academic.predicted_performance if academic else None,
+                "predicted_final_score": academic['predicted_performance'] if academic else None,
                 "interpretation": "Based on your current trends."
             },
             "risk": {
-                "risk_level": academic.risk_level if academic else "Low",
+                "risk_level": academic['risk_level'] if academic else "Low",
                 "probabilities": {"Low": 0.8, "Medium": 0.15, "High": 0.05} # Placeholder
             },
             "recommendations": recommendations if recommendations else []
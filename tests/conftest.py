@@ -0,0 +1,27 @@
+"""
+Shared test fixtures
+Tests run against a throwaway SQLite database, set up before the app modules import
+"""
+import os
+import tempfile
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+
+import pytest
+
+from database import engine, SessionLocal
+from models.sql_models import Base
+from preprocessing import invalidate_data_cache
+
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+        # Frames cached by one test must not leak into the next
+        invalidate_data_cache()
@@ -0,0 +1,61 @@
+"""
+Tests for the analytics responses built from the cached data frames
+"""
+import datetime
+
+import orjson
+
+from models.sql_models import User, StudentAcademicData, StudentBehaviorData, UserRole
+from preprocessing import invalidate_data_cache
+from services import AnalyticsService
+
+
+def _add_students(db, count):
+    students = [
+        User(name=f"Student {i}", email=f"s{i}@test.com", hashed_password="x", role=UserRole.STUDENT)
+        for i in range(count)
+    ]
+    db.add_all(students)
+    db.flush()
+    return students
+
+
+def test_student_trends_stay_in_date_order(db):
+    students = _add_students(db, 40)
+    # One check-in per student per day, so each student's rows are spread through the table
+    for day in range(5):
+        for student in students:
+            db.add(StudentBehaviorData(
+                student_id=student.id,
+                mood_score=3,
+                sleep_hours=7.0,
+                study_hours=4.0,
+                timestamp=datetime.datetime(2024, 1, 1 + day)
+            ))
+    db.commit()
+    invalidate_data_cache()
+    
+    service = AnalyticsService()
+    for student in students:
+        trends = service.get_student_performance_trends(student.id)['mental_trends']
+        dates = [trend['date'] for trend in trends]
+        assert dates == sorted(dates)
+        assert len(dates) == 5
+
+
+def test_responses_keep_stored_float_values(db):
+    students = _add_students(db, 2)
+    for student, value in zip(students, (72.3, 90.0)):
+        db.add(StudentAcademicData(student_id=student.id, marks=value, attendance=value, assignment_scores=80.0))
+        db.add(StudentBehaviorData(student_id=student.id, mood_score=4, sleep_hours=value, study_hours=4.0))
+    db.commit()
+    invalidate_data_cache()
+    
+    service = AnalyticsService()
+    correlation = service.get_attendance_marks_correlation()
+    trends = service.get_student_performance_trends(students[0].id)
+    
+    assert correlation['data_points'][0]['attendance_percentage'] == 72.3
+    assert trends['subjects'][0]['subject_marks'] == 72.3
+    assert trends['mental_trends'][0]['sleep_hours'] == 72.3
+    assert b'72.30000' not in orjson.dumps([correlation, trends])